@@ -0,0 +1,46 @@
+"""
+Benchmark for building a simulation with many quantities.
+
+Compares adding the quantities one by one with `addQuantity` to the bulk
+methods `add_quantities` and `from_spec`. Run as
+
+    python benchmarks/construction.py [number of quantities] [size of each]
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+# use the simobject of this repository, even if it is not installed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simobject import Simulation  # noqa: E402
+
+
+def main(n=2000, size=10, repeat=5):
+    values = {f'q{i}': np.ones(size) for i in range(n)}
+    spec = {'quantities': {
+        key: {'value': val, 'info': key} for key, val in values.items()}}
+
+    def one_by_one():
+        sim = Simulation()
+        for key, val in values.items():
+            sim.addQuantity(key, val, info=key)
+
+    def bulk():
+        sim = Simulation()
+        sim.add_quantities(spec['quantities'])
+
+    def from_spec():
+        Simulation.from_spec(spec)
+
+    print(f'{n} quantities of size {size}:')
+    for func in [one_by_one, bulk, from_spec]:
+        t = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(f'    {func.__name__:12s}: {t * 1e3:8.2f} ms ({t / n * 1e6:.2f} µs per quantity)')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,40 @@
+"""
+Benchmark of the import time of simobject, measured with `python -X importtime`.
+
+Prints the cumulative time of the slowest imports for a few typical
+import statements. Run as
+
+    python benchmarks/import_time.py
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = [
+    'import simobject',
+    'from simobject import Simulation',
+    'from simobject import DistributedSimulation',
+]
+
+
+def importtime(code, n=5):
+    "returns the lines of `-X importtime` with the largest cumulative times"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                         capture_output=True, text=True, env=env, check=True).stderr
+    lines = [line.split('|') for line in out.splitlines()[1:] if line.startswith('import time:')]
+    lines = sorted(lines, key=lambda line: -int(line[1]))
+    return [(int(line[1]), line[2].strip()) for line in lines[:n]]
+
+
+def main():
+    for code in STATEMENTS:
+        print(code)
+        for cumulative, module in importtime(code):
+            print(f'    {cumulative / 1e3:8.2f} ms  {module}')
+
+
+if __name__ == '__main__':
+    main()
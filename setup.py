@@ -32,6 +32,7 @@ if __name__ == "__main__":
         author='Til Birnstiel',
         author_email='til.birnstiel@lmu.de',
         license='GPLv3',
+        python_requires='>=3.8',
         packages=[PACKAGENAME],
         package_dir={PACKAGENAME: PACKAGENAME},
         install_requires=[
@@ -1,14 +1,48 @@
-from .quantity import Quantity
-from .simulation import Simulation
-from .updater import Updater, DataUpdater
-from .heartbeat_object import HeartbeatObject
+"""
+simple basic framework for a simulation
+
+The classes are imported from their submodules when they are first
+accessed, so that `import simobject` does not import numpy or any of the
+optional dependencies (scipy, numba, mpi4py) before they are needed.
+"""
+import importlib
 
 __version__ = '0.1.5'
 
-__all__ = [
-    'Quantity',
-    'Simulation',
-    'Updater',
-    'DataUpdater',
-    'HeartbeatObject',
-]
+# maps each public name to the submodule that defines it
+
+_submodules = {
+    'Quantity': 'quantity',
+    'Simulation': 'simulation',
+    'Updater': 'updater',
+    'DataUpdater': 'updater',
+    'KernelUpdater': 'updater',
+    'CachedUpdater': 'updater',
+    'HeartbeatObject': 'heartbeat_object',
+    'SparseQuantity': 'structured',
+    'BandedQuantity': 'structured',
+    'DistributedSimulation': 'distributed',
+    'DistributedDataUpdater': 'distributed',
+    'LocalComm': 'distributed',
+    'run_local': 'distributed',
+    'MemoryBudget': 'memory',
+    'MemoryBudgetExceeded': 'memory',
+    'Tracer': 'tracing',
+    'RingBuffer': 'tracing',
+    'JSONLines': 'tracing',
+    'ChromeTrace': 'tracing',
+}
+
+__all__ = list(_submodules)
+
+
+def __getattr__(name):
+    if name not in _submodules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module('.' + _submodules[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
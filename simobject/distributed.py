@@ -0,0 +1,401 @@
+"""
+Domain decomposition of grid quantities across processes.
+
+A `DistributedSimulation` runs in every process (rank) and holds, for each
+distributed quantity, only the block of rows (first axis) that belongs to
+this rank, plus `ghost` rows on either side which are copied from the
+neighbouring ranks between the systole, update, and diastole phases.
+
+The communication uses `mpi4py` if it is installed and no other communicator
+is given. `run_local` starts a number of processes on the local machine that
+communicate through a `LocalComm` instead, which implements the few methods
+of `mpi4py.MPI.Comm` that are used here.
+"""
+import multiprocessing
+import pickle
+import traceback
+
+import numpy as np
+
+from .simulation import Simulation
+from .updater import DataUpdater
+
+
+class LocalComm:
+    """
+    Communicator between local processes, mimicking a subset of `mpi4py.MPI.Comm`.
+
+    Every rank has an inbox queue, messages to a rank are put into its inbox.
+    Messages are picked by source and tag, others are kept until requested.
+    Like in mpi4py, objects are pickled when they are sent, so they can be
+    changed right afterwards.
+
+    Parameters
+    ----------
+
+    rank : int, optional, defaults to 0
+        the rank of this process
+
+    size : int, optional, defaults to 1
+        the total number of processes
+
+    queues : list, optional
+        one `multiprocessing.Queue` per rank, not needed if `size` is 1
+    """
+
+    PROC_NULL = -1
+
+    def __init__(self, rank=0, size=1, queues=None):
+        if size > 1 and (queues is None or len(queues) != size):
+            raise ValueError('one queue per rank is needed')
+        self.rank = rank
+        self.size = size
+        self._queues = queues
+        self._pending = []
+
+    def Get_rank(self):
+        return self.rank
+
+    def Get_size(self):
+        return self.size
+
+    def send(self, obj, dest, tag=0):
+        "sends `obj` to rank `dest`"
+        if dest == self.PROC_NULL:
+            return
+        self._queues[dest].put((self.rank, tag, pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)))
+
+    def recv(self, source, tag=0):
+        "returns the next object sent by rank `source` with tag `tag`"
+        if source == self.PROC_NULL:
+            return None
+
+        for i, (src, tg, data) in enumerate(self._pending):
+            if src == source and tg == tag:
+                del self._pending[i]
+                return pickle.loads(data)
+
+        inbox = self._queues[self.rank]
+        while True:
+            src, tg, data = inbox.get()
+            if src == source and tg == tag:
+                return pickle.loads(data)
+            self._pending.append((src, tg, data))
+
+    def sendrecv(self, sendobj, dest, sendtag=0, source=PROC_NULL, recvtag=0):
+        "sends `sendobj` to `dest` and returns what is received from `source`"
+        self.send(sendobj, dest, tag=sendtag)
+        return self.recv(source, tag=recvtag)
+
+    def gather(self, sendobj, root=0):
+        "returns the list of `sendobj` of all ranks on `root`, None elsewhere"
+        tag = '_gather'
+        if self.rank != root:
+            self.send(sendobj, root, tag=tag)
+            return None
+        return [sendobj if rank == root else self.recv(rank, tag=tag)
+                for rank in range(self.size)]
+
+
+def _worker(func, comm, args, results):
+    "runs `func(comm, *args)` and passes the result or the error on to `results`"
+    try:
+        results.put((comm.rank, True, func(comm, *args)))
+    except BaseException:
+        results.put((comm.rank, False, traceback.format_exc()))
+
+
+def run_local(func, nranks, args=(), timeout=None):
+    """runs `func(comm, *args)` in `nranks` local processes.
+
+    Each process gets its own `LocalComm`. On platforms that do not fork,
+    `func` and `args` need to be picklable.
+
+    Parameters
+    ----------
+
+    func : callable
+        the function to run in each process
+
+    nranks : int
+        number of processes
+
+    args : tuple, optional
+        further arguments passed to `func`
+
+    timeout : float, optional
+        seconds to wait for each result, forever if None
+
+    Returns
+    -------
+    list : the return values of `func`, ordered by rank
+    """
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+
+    queues = [ctx.Queue() for _ in range(nranks)]
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(func, LocalComm(rank, nranks, queues), args, results))
+        for rank in range(nranks)]
+
+    for proc in procs:
+        proc.start()
+
+    try:
+        output = [results.get(timeout=timeout) for _ in range(nranks)]
+    finally:
+        for proc in procs:
+            proc.join(timeout=0 if timeout is not None else None)
+            if proc.is_alive():
+                proc.terminate()
+
+    errors = [msg for _, ok, msg in output if not ok]
+    if errors:
+        raise RuntimeError('error in local worker:\n' + errors[0])
+
+    return [result for _, _, result in sorted(output, key=lambda x: x[0])]
+
+
+def _default_comm():
+    "returns `mpi4py.MPI.COMM_WORLD` if available, else a single-rank `LocalComm`"
+    try:
+        from mpi4py import MPI
+    except ImportError:
+        return LocalComm()
+    return MPI.COMM_WORLD
+
+
+def _block(n, size, rank):
+    "returns the first and last+1 row of the block of `rank` if `n` rows are split on `size` ranks"
+    count, rest = divmod(n, size)
+    lo = rank * count + min(rank, rest)
+    return lo, lo + count + (rank < rest)
+
+
+class DistributedSimulation(Simulation):
+    """
+    Simulation whose grid quantities are split along their first axis across ranks.
+
+    Quantities added with `add_distributed` only hold the local block of rows
+    and `ghost` rows on each side. All other quantities are kept as usual
+    (and should be identical on all ranks). In `update` and `aupdate`, the
+    ghost rows are exchanged with the neighbouring ranks after the systole and
+    after the update phase; a `tracer` records these exchanges with the phase
+    `'exchange_halos'`. The ghost rows at the outer boundaries of the global grid
+    are never overwritten, setting them is up to the updaters.
+
+    Parameters
+    ----------
+
+    comm : communicator, optional
+        a `mpi4py.MPI.Comm` or `LocalComm`. Defaults to `mpi4py.MPI.COMM_WORLD`
+        if mpi4py is installed, else to a single rank.
+
+    ghost : int, optional, defaults to 1
+        number of ghost rows on each side
+
+    kwargs : dict
+        passed on to `Simulation`
+    """
+
+    __slots__ = ["_comm", "_ghost", "_blocks"]
+
+    def __init__(self, comm=None, ghost=1, **kwargs):
+        super().__init__(**kwargs)
+        super().__setattr__("_comm", _default_comm() if comm is None else comm)
+        super().__setattr__("_ghost", ghost)
+        super().__setattr__("_blocks", {})
+
+    @property
+    def comm(self):
+        return self._comm
+
+    @property
+    def rank(self):
+        return self._comm.Get_rank()
+
+    @property
+    def size(self):
+        return self._comm.Get_size()
+
+    def add_distributed(self, key, value, **kwargs):
+        """adds the local block of the global array `value` as quantity `key`.
+
+        The block is padded with `ghost` rows on both sides, which at the
+        outer boundaries are copies of the first and last row.
+        Other keywords are passed to `addQuantity`.
+        """
+        value = np.asarray(value)
+        n = value.shape[0]
+        g = self._ghost
+        lo, hi = _block(n, self.size, self.rank)
+
+        if hi - lo < g:
+            raise ValueError(f'{key}: {hi - lo} rows per rank are too few for {g} ghost rows')
+
+        padded = np.pad(value, [(g, g)] + [(0, 0)] * (value.ndim - 1), mode='edge')
+        self.addQuantity(key, padded[lo:hi + 2 * g], **kwargs)
+        self._blocks[key] = (lo, hi, n)
+
+    def block(self, key):
+        "returns the first and last+1 global row of the local block of `key`"
+        lo, hi, _ = self._blocks[key]
+        return lo, hi
+
+    def interior(self, key):
+        "returns the local rows of `key` without the ghost rows"
+        q = getattr(self, key)
+        return q[self._ghost:q.shape[0] - self._ghost]
+
+    def exchange_halos(self, keys=None):
+        """copies the outermost interior rows of each distributed quantity
+        into the ghost rows of the neighbouring ranks"""
+        g = self._ghost
+        if g == 0 or self.size == 1:
+            return
+
+        comm = self._comm
+        rank = self.rank
+        null = _proc_null(comm)
+        left = rank - 1 if rank > 0 else null
+        right = rank + 1 if rank < self.size - 1 else null
+
+        for key in (self._blocks if keys is None else keys):
+            q = self._quantities[key]
+            a = q.view(np.ndarray)
+            n = a.shape[0]
+
+            recv = comm.sendrecv(np.ascontiguousarray(a[n - 2 * g:n - g]),
+                                 dest=right, sendtag=1, source=left, recvtag=1)
+            if recv is not None:
+                a[:g] = recv
+
+            recv = comm.sendrecv(np.ascontiguousarray(a[g:2 * g]),
+                                 dest=left, sendtag=2, source=right, recvtag=2)
+            if recv is not None:
+                a[n - g:] = recv
+
+            q._version += 1
+
+    def gather(self, key, root=0):
+        "returns the global array of `key` on rank `root`, None on the others"
+        blocks = self._comm.gather(np.ascontiguousarray(self.interior(key)), root=root)
+        if blocks is None:
+            return None
+        return np.concatenate(blocks)
+
+    def update(self):
+        """updates everything like `Simulation.update`, but exchanges the
+        ghost rows after the systole and after the update phase."""
+        self._start_step()
+
+        if self._tracer is not None:
+            self._traced_update()
+            return
+
+        for phase, key, obj in self._calls():
+            getattr(obj, phase)()
+
+        self._finish_step()
+
+    def _calls(self):
+        """like `Simulation._calls`, but with a call of `exchange_halos` on
+        the simulation at the end of the systole and of the update phase,
+        so that `aupdate` and traced updates exchange the ghost rows too."""
+        phases = ['systole', 'update', 'diastole']
+        current = 0
+
+        for phase, key, obj in super()._calls():
+            while phase != phases[current]:
+                current += 1
+                yield 'exchange_halos', None, self
+            yield phase, key, obj
+
+        while current < 2:
+            current += 1
+            yield 'exchange_halos', None, self
+
+    def fork(self):
+        """returns a new simulation that continues independently from this
+        state, see `Simulation.fork`. The fork uses the same communicator, so
+        all ranks need to fork and update their simulations alike."""
+        new = super().fork()
+        new._comm = self._comm
+        new._ghost = self._ghost
+        new._blocks = dict(self._blocks)
+        return new
+
+    def __reduce_ex__(self, protocol):
+        """pickle like a `Simulation`, including the ghost rows and blocks.
+
+        The communicator is not pickled, the unpickled simulation uses the
+        default communicator (see `DistributedSimulation`).
+        """
+        func, args, state = super().__reduce_ex__(protocol)
+        state['ghost'] = self._ghost
+        state['blocks'] = self._blocks
+        return func, args, state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._comm = _default_comm()
+        self._ghost = state['ghost']
+        self._blocks = state['blocks']
+
+
+def _proc_null(comm):
+    "the rank that stands for 'no neighbour' in `comm`"
+    if isinstance(comm, LocalComm):
+        return comm.PROC_NULL
+    from mpi4py import MPI
+    return MPI.PROC_NULL
+
+
+class DistributedDataUpdater(DataUpdater):
+    """
+    DataUpdater for a `DistributedSimulation`.
+
+    If `gather` is True, the distributed quantities are gathered and all
+    snapshots are only stored on rank `root`. Otherwise every rank stores
+    the interior of its own blocks, so that they can be written in parallel.
+
+    Parameters
+    ----------
+
+    keys : list
+        names of the quantities to store
+
+    root : int, optional, defaults to 0
+        the rank that stores the gathered snapshots
+
+    gather : bool, optional, defaults to True
+        whether to gather the distributed quantities on `root`
+
+    other arguments are passed to `DataUpdater`
+    """
+
+    def __init__(self, keys, *args, root=0, gather=True, **kwargs):
+        super().__init__(keys, *args, **kwargs)
+        self.root = root
+        self.gather = gather
+
+    def update(self, sim, string=None):
+        if string is not None:
+            self.string = string
+
+        on_root = sim.rank == self.root
+
+        if on_root or not self.gather:
+            self.print(sim)
+
+        for key in self.keys:
+            if key not in sim._blocks:
+                value = getattr(sim, key)
+            elif self.gather:
+                value = sim.gather(key, root=self.root)
+            else:
+                value = sim.interior(key)
+
+            if on_root or not self.gather:
+                self.append(sim, key, value)
@@ -0,0 +1,112 @@
+import numpy as np
+
+from .quantity import Quantity
+from .structured import SparseQuantity
+
+
+class Journal:
+    """
+    Rollback journal for the transactional updates of a `Simulation`.
+
+    When a transaction begins, the quantities that have a systoler, updater,
+    or diastoler, and the ones named in the `writes` of any updater, are
+    copied. Every other quantity is copied by `save` right before it is
+    first changed with `setvalue` or an in-place operator. Writes through
+    item assignment or numpy's `out` argument to quantities without
+    updaters are not noticed.
+
+    The copies are kept in buffers that are reused in the next transaction,
+    so a step only copies what changes, without allocating new memory.
+    Sparse quantities are copied into new matrices instead.
+    """
+
+    def __init__(self):
+        self.open = False
+        self._buffers = {}
+        self._saved = {}
+        self._tracked = []
+
+    def begin(self, sim):
+        "starts a new transaction on `sim`, committing the previous one"
+        if self.open:
+            self.commit()
+
+        self.open = True
+        self._step = sim._step
+        self._quantities = dict(sim._quantities)
+        self._data = dict(sim._data)
+
+        writes = set()
+        for updater in [sim._systoler, sim._diastoler]:
+            writes.update(getattr(updater, 'writes', None) or [])
+
+        for q in self._quantities.values():
+            if not isinstance(q, (Quantity, SparseQuantity)):
+                continue
+            q._journal = self
+            self._tracked.append(q)
+            updaters = [q._systoler, q._updater, q._diastoler]
+            if any(u is not None for u in updaters):
+                self.save(q)
+            for updater in updaters:
+                writes.update(getattr(updater, 'writes', None) or [])
+
+        # forget the buffers of quantities that are gone
+
+        ids = {id(q) for q in self._tracked}
+        self._buffers = {key: buf for key, buf in self._buffers.items() if key in ids}
+
+        for key in writes:
+            if isinstance(self._quantities.get(key, None), (Quantity, SparseQuantity)):
+                self.save(self._quantities[key])
+
+    def save(self, q):
+        "copies `q` into its buffer, unless it was saved already in this transaction"
+        key = id(q)
+        if key in self._saved:
+            return
+
+        if isinstance(q, SparseQuantity):
+            self._saved[key] = (q, q.snapshot())
+            return
+
+        value = q.view(np.ndarray)
+        buffer = self._buffers.get(key, None)
+        if buffer is None or buffer.shape != value.shape or buffer.dtype != value.dtype:
+            buffer = np.empty_like(value)
+            self._buffers[key] = buffer
+
+        np.copyto(buffer, value)
+        self._saved[key] = (q, buffer)
+
+    def commit(self):
+        "ends the transaction, keeping all changes"
+        for q in self._tracked:
+            q._journal = None
+        self._tracked = []
+        self._saved = {}
+        self._quantities = None
+        self._data = None
+        self.open = False
+
+    def rollback(self, sim):
+        "restores `sim` to the state at the beginning of the transaction"
+        for q, buffer in self._saved.values():
+            if isinstance(q, SparseQuantity):
+                q.value = buffer
+            else:
+                np.copyto(q.view(np.ndarray), buffer)
+            q._version += 1
+
+        sim._quantities.clear()
+        sim._quantities.update(self._quantities)
+        sim._data.clear()
+        sim._data.update(self._data)
+        sim._step = self._step
+
+        self.commit()
+
+    @property
+    def nbytes(self):
+        "the memory of the buffers in bytes"
+        return sum(buffer.nbytes for buffer in self._buffers.values())
@@ -0,0 +1,205 @@
+import os
+import sys
+
+import numpy as np
+
+from .structured import issparse, _sparse_nbytes
+from .updater import DataUpdater
+
+
+class MemoryBudgetExceeded(MemoryError):
+    "raised if a simulation uses more memory than its `MemoryBudget` allows"
+    pass
+
+
+def nbytes(obj):
+    """returns the memory used by `obj` in bytes.
+
+    This is `nbytes` for arrays, the values and indices for sparse matrices,
+    the sum over the elements for lists, tuples, and dicts, and
+    `sys.getsizeof` for everything else.
+    """
+    if issparse(obj):
+        return _sparse_nbytes(obj)
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    if isinstance(obj, (list, tuple)):
+        return sum(nbytes(o) for o in obj)
+    if isinstance(obj, dict):
+        return sum(nbytes(o) for o in obj.values())
+    return sys.getsizeof(obj)
+
+
+def memory_report(sim):
+    """returns the memory usage of `sim` as dictionary with the entries
+
+    - `quantities`: bytes per quantity
+    - `data`: bytes per entry of `sim.data`
+    - `constant`, `mutable`, `history`: bytes of the constant and
+      mutable quantities, and of `sim.data`
+    - `total`: the sum of the three
+    """
+    quantities = {key: nbytes(q) for key, q in sim._quantities.items()}
+    data = {key: nbytes(val) for key, val in sim._data.items()}
+
+    constant = sum(quantities[key] for key, q in sim._quantities.items()
+                   if getattr(q, '_constant', False))
+    mutable = sum(quantities.values()) - constant
+    history = sum(data.values())
+
+    return {
+        'quantities': quantities,
+        'data': data,
+        'constant': constant,
+        'mutable': mutable,
+        'history': history,
+        'total': constant + mutable + history,
+    }
+
+
+def _history_keys(sim):
+    "names of the arrays in `sim.data` that are written by a `DataUpdater` of `sim`"
+    updaters = [sim._systoler, sim._updater, sim._diastoler]
+    for q in sim._quantities.values():
+        updaters += [q._systoler, q._updater, q._diastoler]
+
+    keys = set()
+    for updater in updaters:
+        if isinstance(updater, DataUpdater):
+            keys.update(updater.keys)
+
+    return [key for key, val in sim.data.items()
+            if key in keys and isinstance(val, np.ndarray)]
+
+
+class MemoryBudget:
+    """
+    Memory limit of a simulation, checked after every update.
+
+    Attach it with `sim.memory_budget = MemoryBudget(...)`. If the memory
+    reported by `sim.memory_report()` exceeds `limit`, the policy is applied:
+
+    - `'raise'`: raise `MemoryBudgetExceeded`
+    - `'decimate'`: keep only every `factor`-th snapshot of the histories in
+      `sim.data`. From then on, only the snapshots that fit this spacing are
+      kept, so that the history stays evenly spaced. The indices of the kept
+      snapshots (counting all snapshots ever taken) are listed in `kept`.
+    - `'spill'`: move the histories in `sim.data` to `.npy` files in `spill_dir`,
+      `load` returns them again.
+
+    Histories are the arrays in `sim.data` that are written by a `DataUpdater`
+    of the simulation or of its quantities, other entries like parameters are
+    never changed.
+
+    If decimating or spilling cannot bring the memory below the limit,
+    `MemoryBudgetExceeded` is raised.
+
+    Parameters
+    ----------
+
+    limit : int
+        the memory limit in bytes
+
+    policy : str, optional, defaults to 'raise'
+        'raise', 'decimate', or 'spill'
+
+    spill_dir : str | path, optional
+        directory for the spilled data, required for policy 'spill'
+
+    factor : int, optional, defaults to 2
+        decimation factor for policy 'decimate'
+    """
+
+    def __init__(self, limit, policy='raise', spill_dir=None, factor=2):
+        if policy not in ['raise', 'decimate', 'spill']:
+            raise ValueError("<policy> must be 'raise', 'decimate', or 'spill'")
+        if policy == 'spill' and spill_dir is None:
+            raise ValueError('policy spill needs a spill_dir')
+        self.limit = limit
+        self.policy = policy
+        self.spill_dir = spill_dir
+        self.factor = factor
+        self.spilled = {}
+        self.kept = {}
+        self.stride = 1
+        self._counts = {}
+
+    def check(self, sim):
+        "applies the policy if `sim` exceeds the limit"
+        if self.policy == 'decimate':
+            self._thin(sim)
+
+        total = memory_report(sim)['total']
+
+        if total <= self.limit:
+            return
+
+        if self.policy == 'decimate':
+            total = self._decimate(sim)
+        elif self.policy == 'spill':
+            total = self._spill(sim)
+
+        if total > self.limit:
+            raise MemoryBudgetExceeded(
+                f'simulation uses {total} bytes, the budget is {self.limit} bytes')
+
+    def _snapshots(self, sim):
+        "names of the histories in `sim.data` that hold more than one snapshot"
+        return [key for key in _history_keys(sim)
+                if sim.data[key].ndim > 0 and len(sim.data[key]) > 1]
+
+    def _thin(self, sim):
+        """records the snapshots added since the last check, and drops those
+        of them that do not fit the current spacing `stride`"""
+        for key in list(self.kept):
+            if key not in sim.data:
+                del self.kept[key]
+                del self._counts[key]
+
+        for key in self._snapshots(sim):
+            val = sim.data[key]
+            kept = self.kept.get(key, np.arange(0))[:len(val)]
+            start = self._counts.get(key, 0)
+            new = np.arange(start, start + len(val) - len(kept))
+            self._counts[key] = start + len(new)
+
+            mask = np.ones(len(val), dtype=bool)
+            mask[len(kept):] = new % self.stride == 0
+            if not mask.all():
+                sim.data[key] = val[mask].copy()
+            self.kept[key] = np.concatenate((kept, new[mask[len(kept):]]))
+
+    def _decimate(self, sim):
+        "increases the spacing of the snapshots until below the limit or down to one snapshot each"
+        while True:
+            total = memory_report(sim)['total']
+            keys = self._snapshots(sim)
+            if total <= self.limit or not keys:
+                return total
+            self.stride *= self.factor
+            for key in keys:
+                mask = self.kept[key] % self.stride == 0
+                if not mask.any():
+                    mask[0] = True
+                sim.data[key] = sim.data[key][mask].copy()
+                self.kept[key] = self.kept[key][mask]
+
+    def _spill(self, sim):
+        "writes all histories in sim.data to disk and removes them from memory"
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        for key in _history_keys(sim):
+            files = self.spilled.setdefault(key, [])
+            fname = os.path.join(self.spill_dir, f'{key}.{len(files):04d}.npy')
+            np.save(fname, sim.data.pop(key))
+            files.append(fname)
+
+        return memory_report(sim)['total']
+
+    def load(self, key, sim=None):
+        """returns the spilled snapshots of `key`, followed by the ones still
+        in `sim.data` if `sim` is given"""
+        chunks = [np.load(fname) for fname in self.spilled.get(key, [])]
+        if sim is not None and key in sim.data:
+            chunks.append(sim.data[key])
+        return np.vstack(chunks)
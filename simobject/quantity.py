@@ -1,7 +1,13 @@
+import itertools
+
 from .heartbeat_object import HeartbeatObject
 
 import numpy as np
 
+# every Quantity object gets its own number, which is never reused
+
+_uids = itertools.count()
+
 
 class Quantity(np.ndarray, HeartbeatObject):
     """numpy.ndarray that also stores its owner and a info string.
@@ -50,6 +56,12 @@ class Quantity(np.ndarray, HeartbeatObject):
 
     constant : bool
         if constant, then the value cannot be changed
+
+    Every Quantity counts its modifications in `version`: the counter is
+    increased by `setvalue`, by in-place operators like `+=`, and after each
+    call of its systoler, updater, or diastoler. Writes through item
+    assignment (`q[0] = 1`) or the `out` argument of numpy functions are not
+    counted.
     """
 
     def __new__(
@@ -107,21 +119,105 @@ class Quantity(np.ndarray, HeartbeatObject):
         self._updater = getattr(obj, "_updater", None)
         self._systoler = getattr(obj, "_systoler", None)
         self._diastoler = getattr(obj, "_diastoler", None)
+        self._version = 0
+        self._journal = None
+        self._uid = next(_uids)
+
+    def __reduce_ex__(self, protocol):
+        """pickle the plain array and the attributes separately.
+
+        The array is pickled by numpy, so with protocol 5 its buffer can be
+        passed out-of-band without copying. The attributes (info, constant,
+        updaters) are the state. The owner is not pickled, so that slices and
+        results of arithmetic do not carry their whole simulation along; a
+        pickled `Simulation` sets itself as owner of its quantities again.
+        An open rollback journal is not pickled either.
+        """
+        state = dict(self.__dict__, owner=None, _journal=None)
+        state.pop('_uid', None)
+        return (_rebuild, (type(self), self.view(np.ndarray)), state)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            self.__dict__.update(state)
+        else:
+            # pickles created by ndarray.__reduce__
+            super().__setstate__(state)
 
     def __repr__(self):
         rep = super().__repr__()
         if self._constant:
             rep = "Constant " + rep
         if self.info is not None:
-            rep = rep.replace(__class__.__name__, f"{self.info}\n")
+            rep = rep.replace(type(self).__name__, f"{self.info}\n")
         return rep
 
     def setvalue(self, value):
         """sets this array to the new value, but keeps its info and owner"""
         if self._constant:
             raise TypeError("This Quantity is constant.")
+        if self._journal is not None:
+            self._journal.save(self)
         self.setfield(value, self.dtype)
+        self._version += 1
+
+    def systole(self):
+        "call the Systole updater"
+        if self._systoler is not None:
+            self._systoler.update(self)
+            self._version += 1
+
+    def update(self):
+        "call the Updater to do the update"
+        if self._updater is not None:
+            self._updater.update(self)
+            self._version += 1
+
+    def diastole(self):
+        "call the Diastole updater"
+        if self._diastoler is not None:
+            self._diastoler.update(self)
+            self._version += 1
+
+    @property
+    def version(self):
+        "the number of modifications of this Quantity"
+        return self._version
+
+    @property
+    def uid(self):
+        """a number that identifies this Quantity object. Unlike `id`, it is
+        never reused, so `(uid, version)` identifies the value of a Quantity."""
+        return self._uid
 
     @property
     def constant(self):
         return self._constant
+
+
+def _inplace(name):
+    "returns the in-place operator `name` of ndarray that also counts the modification"
+    op = getattr(np.ndarray, name)
+
+    def method(self, other):
+        if self._journal is not None:
+            self._journal.save(self)
+        result = op(self, other)
+        self._version += 1
+        return result
+
+    method.__name__ = name
+    method.__doc__ = op.__doc__
+    return method
+
+
+for _name in ['__iadd__', '__isub__', '__imul__', '__imatmul__', '__itruediv__',
+              '__ifloordiv__', '__imod__', '__ipow__', '__ilshift__', '__irshift__',
+              '__iand__', '__ixor__', '__ior__']:
+    setattr(Quantity, _name, _inplace(_name))
+del _name
+
+
+def _rebuild(cls, array):
+    "unpickle a Quantity of type `cls` from `array`"
+    return array.view(cls)
@@ -1,6 +1,14 @@
 from collections import OrderedDict
+import copy
+import importlib
+import os
+
+import numpy as np
 
 from .quantity import Quantity
+from .structured import SparseQuantity, issparse
+from .memory import memory_report
+from .journal import Journal
 from .heartbeat_object import HeartbeatObject
 
 
@@ -16,12 +24,25 @@ class Simulation(HeartbeatObject):
 
     the lists `systole_order`, `update_order`, and `diastole_order` can be set, but if they are empty
     they return the order in which the Quantities were added.
+
+    Parameters
+    ----------
+
+    dtype : data-type, optional
+        if given, floating point quantities are stored with this dtype
+        (e.g. `np.float32`) unless a dtype is given for them
+
+    dtypes : dict, optional
+        maps quantity names to the dtype they are stored with, to pin
+        accumulating quantities like `time` to `np.float64`
     """
 
     __slots__ = ["_quantities", "_systole_order",
-                 "_update_order", "_diastole_order", "_data"]
+                 "_update_order", "_diastole_order", "_data",
+                 "_step", "_tracer", "_stamps", "_dtype", "_dtypes", "_budget",
+                 "_journal"]
 
-    def __init__(self):
+    def __init__(self, dtype=None, dtypes=None):
 
         # we call the method from super because we overwrite the own __setattr__
 
@@ -30,6 +51,13 @@ class Simulation(HeartbeatObject):
         super().__setattr__("_update_order", [])
         super().__setattr__("_diastole_order", [])
         super().__setattr__("_data", {})
+        super().__setattr__("_step", 0)
+        super().__setattr__("_tracer", None)
+        super().__setattr__("_stamps", {})
+        super().__setattr__("_dtype", None if dtype is None else np.dtype(dtype))
+        super().__setattr__("_dtypes", dict(dtypes or {}))
+        super().__setattr__("_budget", None)
+        super().__setattr__("_journal", None)
 
     # this is how one gets an attribute
 
@@ -45,19 +73,21 @@ class Simulation(HeartbeatObject):
     def __setattr__(self, key, value):
         _quantities = super().__getattribute__("_quantities")
 
-        if isinstance(value, Quantity):
+        if isinstance(value, (Quantity, SparseQuantity)):
             self.addQuantity(key, value, info=value.info or key)
         elif key in _quantities:
             _quantities[key].setvalue(value)
         else:
             super().__setattr__(key, value)
 
-    def addQuantity(self, key, value, info=None, updater=None, systoler=None, diastoler=None, constant=None, copy=True):
+    def addQuantity(self, key, value, info=None, updater=None, systoler=None, diastoler=None, constant=None, copy=True,
+                    dtype=None):
         """
         adds `value` as apparent attribute under the name `key`.
 
         `value` will be casted to type Quantity. If a numpy ndarray is
-        passed, a new memory buffer will be created.
+        passed, a new memory buffer will be created. A `scipy.sparse` matrix
+        is stored as `SparseQuantity`.
 
         If a quantity is passed,
 
@@ -75,27 +105,140 @@ class Simulation(HeartbeatObject):
         copy : bool, optional, defaults to True
             by default a copy of the input value is created. If set to
             False, the same memory (for ndarrays) or object (for Quantities)
-            are used.
+            are used, unless the dtype needs to be changed.
+
+        dtype : data-type, optional
+            the dtype of the quantity. Defaults to the one given for `key` in
+            the `dtypes` of the simulation, or else, for floating point values,
+            to the `dtype` of the simulation. If given, it is stored in the
+            `dtypes` of the simulation, so quantities that replace this one
+            keep it.
 
         """
-        if isinstance(value, Quantity) and copy is False:
-            q = value
+        self._quantities[key] = self._makequantity(
+            key, value, info, updater, systoler, diastoler, constant, copy, dtype)
+
+    def _makequantity(self, key, value, info=None, updater=None, systoler=None,
+                      diastoler=None, constant=None, copy=True, dtype=None):
+        """creates the Quantity for `addQuantity` without going through
+        `Quantity.__new__` and the updater properties"""
+        # an explicit dtype is remembered, so that it is kept when the
+        # quantity is replaced, e.g. by `sim.time = sim.time + dt`
+
+        if dtype is None:
+            dtype = self._dtypes.get(key, None)
         else:
-            q = Quantity(value, owner=self, copy=copy)
+            self._dtypes[key] = dtype
+
+        if isinstance(value, (Quantity, SparseQuantity)):
+            if copy is False:
+                q = value if dtype is None else value.astype(dtype, copy=False)
+            else:
+                q = value.astype(value.dtype if dtype is None else dtype)
+        elif issparse(value):
+            q = SparseQuantity(value, copy=copy)
+            if dtype is not None:
+                q = q.astype(dtype, copy=False)
+        else:
+            q = np.array(value, copy=copy, dtype=dtype).view(Quantity)
+
+        if dtype is None and self._dtype is not None and q.dtype.kind == 'f':
+            q = q.astype(self._dtype, copy=False)
+
+        if q is not value:
+            q.owner = self
 
         q.info = info or q.info or key
 
         if constant is not None:
             q._constant = constant
 
-        # this actually calls the setter and getter to make sure
-        # the updater is linked correctly
+        if updater is not None:
+            q._updater = self._constructupdater(updater)
+        if systoler is not None:
+            q._systoler = self._constructupdater(systoler)
+        if diastoler is not None:
+            q._diastoler = self._constructupdater(diastoler)
+
+        return q
+
+    def add_quantities(self, quantities):
+        """adds several quantities at once.
+
+        This is faster than calling `addQuantity` for each of them, and all
+        entries are checked before any quantity is added.
+
+        Parameters
+        ----------
+
+        quantities : dict
+            maps the name of each quantity to either its value, or to a dict
+            with the entry `value` and optionally any of the other keywords
+            of `addQuantity`:
+
+                sim.add_quantities({
+                    'nx': {'value': 100, 'info': 'size of x', 'constant': True},
+                    'time': 0.0,
+                    })
+        """
+        entries = []
+
+        for key, entry in quantities.items():
+            if not isinstance(key, str):
+                raise TypeError('not a str: ' + str(key))
+            if isinstance(entry, dict):
+                entry = dict(entry)
+                if 'value' not in entry:
+                    raise ValueError(f'no value given for quantity {key}')
+                unknown = set(entry) - _QUANTITY_OPTIONS
+                if unknown:
+                    raise TypeError(f'unknown options for quantity {key}: {sorted(unknown)}')
+                for name in ['updater', 'systoler', 'diastoler']:
+                    if isinstance(entry.get(name, None), str):
+                        entry[name] = _import_function(entry[name])
+            else:
+                entry = {'value': entry}
+            entries.append((key, entry))
+
+        makequantity = self._makequantity
+        _quantities = self._quantities
+
+        for key, entry in entries:
+            _quantities[key] = makequantity(key, **entry)
 
-        q.updater = updater or q.updater
-        q.systoler = systoler or q.systoler
-        q.diastoler = diastoler or q.diastoler
+    @classmethod
+    def from_spec(cls, spec, **kwargs):
+        """creates a simulation from a specification.
 
-        self._quantities[key] = q
+        Parameters
+        ----------
+
+        spec : dict | str | path
+            either a dictionary or the path to a JSON file containing it.
+            The entry `quantities` is passed to `add_quantities`, the optional
+            entries `systole_order`, `update_order`, `diastole_order` set the
+            orders. Updaters can be given as strings `'module:function'`.
+
+        kwargs : dict
+            passed to the constructor of the simulation, e.g. `dtype`
+
+        Returns
+        -------
+        Simulation
+        """
+        if isinstance(spec, (str, os.PathLike)):
+            import json
+            with open(spec) as fid:
+                spec = json.load(fid)
+
+        sim = cls(**kwargs)
+        sim.add_quantities(spec.get('quantities', {}))
+
+        for name in ['systole_order', 'update_order', 'diastole_order']:
+            if name in spec:
+                setattr(sim, name, list(spec[name]))
+
+        return sim
 
     def update(self):
         """updates everything:
@@ -106,7 +249,16 @@ class Simulation(HeartbeatObject):
         - the update of all quantities in `self.update_order`, then
         - the diastole of all quantities in `self.diastole_order`, then
         - the diastole of the simulation object itself
+
+        If a `tracer` is attached, the timing of every call is recorded.
+        If the simulation is `transactional`, the step can be undone with `rollback`.
         """
+        self._start_step()
+
+        if self._tracer is not None:
+            self._traced_update()
+            return
+
         self.systole()
 
         for key in self.systole_order:
@@ -120,6 +272,314 @@ class Simulation(HeartbeatObject):
 
         self.diastole()
 
+        self._finish_step()
+
+    def _start_step(self):
+        "bookkeeping at the beginning of each update"
+        if self._journal is not None:
+            self._journal.begin(self)
+
+    def _finish_step(self):
+        "bookkeeping at the end of each update"
+        self._stamp()
+        self._step += 1
+        if self._budget is not None:
+            self._budget.check(self)
+
+    def _calls(self):
+        """yields `(phase, key, obj)` for every call of `update` in order,
+        where `key` is None for the simulation itself. Objects without an
+        updater for that phase are skipped."""
+        for phase in ['systole', 'update', 'diastole']:
+
+            # the simulation systole comes first, its diastole last
+
+            keys = list(getattr(self, phase + '_order'))
+            if phase == 'systole':
+                keys.insert(0, None)
+            elif phase == 'diastole':
+                keys.append(None)
+
+            for key in keys:
+                obj = self if key is None else getattr(self, key)
+                if getattr(obj, '_' + phase + 'r') is not None:
+                    yield phase, key, obj
+
+    def _traced_update(self):
+        "same as `update`, but records every call with `self.tracer`"
+        tracer = self._tracer
+        clock = tracer.clock
+        step = self._step
+        start = clock()
+
+        for phase, key, obj in self._calls():
+            t = clock()
+            getattr(obj, phase)()
+            tracer.record(step, phase, key, t, clock(), self._trace_dt())
+
+        self._finish_step()
+        tracer.record(step, 'step', None, start, clock(), self._trace_dt())
+
+    async def aupdate(self, executor=None, offload=()):
+        """same as `update`, but as coroutine for use within asyncio.
+
+        The event loop can run other tasks between the systole, update, and
+        diastole phases. A step is never interrupted halfway: if the task
+        is cancelled, the current step is completed before the cancellation
+        is passed on.
+
+        Parameters
+        ----------
+
+        executor : concurrent.futures.Executor, optional
+            where to run the offloaded calls, defaults to the loop's default executor
+
+        offload : list, optional
+            names of quantities whose systole, update, and diastole are run in
+            `executor` instead of the event loop, for heavy updaters that
+            would block the loop (e.g. because they release the GIL in numpy)
+        """
+        import asyncio
+
+        task = asyncio.ensure_future(self._aupdate(executor, offload))
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            await task
+            raise
+
+    async def _aupdate(self, executor, offload):
+        import asyncio
+
+        self._start_step()
+        loop = asyncio.get_running_loop()
+        tracer = self._tracer
+        step = self._step
+        current = None
+
+        if tracer is not None:
+            start = tracer.clock()
+
+        for phase, key, obj in self._calls():
+            if phase != current:
+                await asyncio.sleep(0)
+                current = phase
+
+            if tracer is not None:
+                t = tracer.clock()
+
+            if key in offload:
+                await loop.run_in_executor(executor, getattr(obj, phase))
+            else:
+                getattr(obj, phase)()
+
+            if tracer is not None:
+                tracer.record(step, phase, key, t, tracer.clock(), self._trace_dt())
+
+        self._finish_step()
+
+        if tracer is not None:
+            tracer.record(step, 'step', None, start, tracer.clock(), self._trace_dt())
+
+    async def arun(self, nsteps, executor=None, offload=()):
+        """calls `aupdate` `nsteps` times, see `aupdate` for the parameters.
+
+        Cancelling the task stops it after the current step.
+        """
+        for _ in range(nsteps):
+            await self.aupdate(executor=executor, offload=offload)
+
+    def _trace_dt(self):
+        "the time step as float, if the simulation has one"
+        dt = self._quantities.get('dt', None)
+        if dt is None or getattr(dt, 'ndim', 0) > 0:
+            return None
+        return float(dt)
+
+    def _stamp(self):
+        """remembers the current step for each quantity that was
+        replaced or changed its `version` since the last call"""
+        stamps = self._stamps
+        step = self._step
+        for key, q in self._quantities.items():
+            uid = getattr(q, '_uid', None)
+            version = getattr(q, '_version', 0)
+            prev = stamps.get(key, None)
+            if prev is None or prev[0] != uid or prev[1] != version:
+                stamps[key] = (uid, version, step)
+
+    def changed_since(self, step):
+        """returns the names of the quantities that changed in or after step `step`.
+
+        Steps are counted from 0, so `sim.changed_since(sim.step)` returns
+        the quantities changed since the last update. Changes made between
+        two updates count for the following step. See `Quantity.version` for
+        which changes are noticed.
+        """
+        self._stamp()
+        return [key for key, (_, _, s) in self._stamps.items()
+                if s >= step and key in self._quantities]
+
+    def memory_report(self):
+        """returns the memory used by the quantities and `data` in bytes.
+
+        The result is a dictionary with the bytes per quantity (`quantities`),
+        per entry of `data` (`data`), the sums of the `constant` and `mutable`
+        quantities and of the `history` in `data`, and the `total`.
+        """
+        return memory_report(self)
+
+    @property
+    def transactional(self):
+        """if True, each update can be undone with `rollback` or kept with `commit`.
+
+        Only the quantities that have updaters (or that are listed in the
+        `writes` of an updater) are copied at the beginning of each update,
+        all others only when they are first changed by `setvalue` or an
+        in-place operator, see `Journal`. Starting the next update commits
+        the previous one.
+        """
+        return self._journal is not None
+
+    @transactional.setter
+    def transactional(self, value):
+        if value and self._journal is None:
+            self._journal = Journal()
+        elif not value and self._journal is not None:
+            self._journal.commit()
+            self._journal = None
+
+    def commit(self):
+        "keeps the changes of the last update in transactional mode"
+        if self._journal is None or not self._journal.open:
+            raise RuntimeError('no open transaction')
+        self._journal.commit()
+
+    def rollback(self):
+        "undoes the last update in transactional mode"
+        if self._journal is None or not self._journal.open:
+            raise RuntimeError('no open transaction')
+        self._journal.rollback(self)
+
+    @property
+    def memory_budget(self):
+        "a `MemoryBudget` that is checked after each update, or None"
+        return self._budget
+
+    @memory_budget.setter
+    def memory_budget(self, value):
+        self._budget = value
+
+    def fork(self):
+        """returns a new simulation that continues independently from this state.
+
+        Unlike `copy.deepcopy`, this is cheap for large constant state:
+
+        - constant quantities share their memory with this simulation, they
+          are read-only views in the fork. Constant sparse quantities share
+          the same `scipy.sparse` matrix, which stays writable.
+        - the arrays in `data` are shared (the `DataUpdater` never changes them
+          in place, it creates new arrays), only the dictionary is new.
+        - mutable quantities are copied.
+        - all quantities are owned by the fork, and updaters which are bound
+          methods of this simulation are re-bound to the fork.
+
+        The tracer and the memory budget are not passed on to the fork.
+        """
+        new = type(self).__new__(type(self))
+        Simulation.__init__(new)
+
+        new.__dict__.update(
+            {key: _rebind(val, self, new) for key, val in self.__dict__.items()})
+
+        for key, q in self._quantities.items():
+            if isinstance(q, (Quantity, SparseQuantity)):
+                if q._constant:
+                    q = q.view()
+                    if isinstance(q, Quantity):
+                        q.flags.writeable = False
+                else:
+                    q = q.copy()
+                q.owner = new
+                q._updater = _rebind(q._updater, self, new)
+                q._systoler = _rebind(q._systoler, self, new)
+                q._diastoler = _rebind(q._diastoler, self, new)
+                q._version = self._quantities[key]._version
+            new._quantities[key] = q
+
+        _set_stamps(new, _current_stamps(self))
+
+        new._systole_order = list(self._systole_order)
+        new._update_order = list(self._update_order)
+        new._diastole_order = list(self._diastole_order)
+        new._data.update(self._data)
+        new._step = self._step
+        new._dtype = self._dtype
+        new._dtypes = dict(self._dtypes)
+
+        return new
+
+    def __copy__(self):
+        """`copy.copy` returns a `fork`, a shallow copy would share the
+        quantities with this simulation and take them over as their owner"""
+        return self.fork()
+
+    def __reduce_ex__(self, protocol):
+        """pickle the quantities, orders, data, and other attributes.
+
+        The tracer is not pickled. The arrays are pickled by the quantities
+        themselves, so with protocol 5 they can be passed out-of-band:
+
+        >>> buffers = []
+        >>> s = pickle.dumps(sim, protocol=5, buffer_callback=buffers.append)
+        >>> sim2 = pickle.loads(s, buffers=buffers)
+        """
+        state = {
+            'quantities': self._quantities,
+            'systole_order': self._systole_order,
+            'update_order': self._update_order,
+            'diastole_order': self._diastole_order,
+            'data': self._data,
+            'step': self._step,
+            'stamps': _current_stamps(self),
+            'dtype': self._dtype,
+            'dtypes': self._dtypes,
+            'budget': self._budget,
+            'dict': self.__dict__,
+            'owned': [key for key, q in self._quantities.items()
+                      if getattr(q, 'owner', None) is self],
+        }
+        return (_rebuild, (type(self),), state)
+
+    def __setstate__(self, state):
+        self._quantities.update(state['quantities'])
+        for key in state.get('owned', []):
+            self._quantities[key].owner = self
+        self._systole_order = state['systole_order']
+        self._update_order = state['update_order']
+        self._diastole_order = state['diastole_order']
+        self._data.update(state['data'])
+        self._step = state['step']
+        _set_stamps(self, state.get('stamps', {}))
+        self._dtype = state.get('dtype', None)
+        self._dtypes = state.get('dtypes', {})
+        self._budget = state.get('budget', None)
+        self.__dict__.update(state['dict'])
+
+    @property
+    def step(self):
+        "the number of completed calls to `update`"
+        return self._step
+
+    @property
+    def tracer(self):
+        "a `Tracer` that records the timing of each update, or None"
+        return self._tracer
+
+    @tracer.setter
+    def tracer(self, value):
+        self._tracer = value
+
     @property
     def update_order(self):
         "the order in which the quantity-updates are called"
@@ -207,3 +667,48 @@ class Simulation(HeartbeatObject):
                                                     type(val).__name__, name)
 
         return s
+
+
+_QUANTITY_OPTIONS = {'value', 'info', 'updater', 'systoler', 'diastoler', 'constant', 'copy', 'dtype'}
+
+
+def _import_function(name):
+    "returns the function given as 'module:function'"
+    module, _, func = name.partition(':')
+    if not func:
+        raise ValueError(f"updater must be given as 'module:function', not {name}")
+    return getattr(importlib.import_module(module), func)
+
+
+def _rebind(updater, old, new):
+    """returns `updater`, or a copy of it if its function is a method of `old`,
+    in which case the method is bound to `new` instead."""
+    func = getattr(updater, 'func', None)
+    if getattr(func, '__self__', None) is not old:
+        return updater
+    updater = copy.copy(updater)
+    updater.func = func.__func__.__get__(new)
+    return updater
+
+
+def _current_stamps(sim):
+    """returns the stamps of `sim` as `{key: (current, version, step)}`, where
+    `current` tells if the stamp refers to the present quantity `key`"""
+    return {key: (uid is not None and uid == getattr(sim._quantities.get(key, None), '_uid', None),
+                  version, step)
+            for key, (uid, version, step) in sim._stamps.items()}
+
+
+def _set_stamps(sim, stamps):
+    "sets the stamps returned by `_current_stamps` of another simulation on `sim`"
+    sim._stamps.update({
+        key: (sim._quantities[key]._uid if current else None, version, step)
+        for key, (current, version, step) in stamps.items()})
+
+
+def _rebuild(cls):
+    """create an empty simulation of type `cls` without calling its `__init__`,
+    used for unpickling"""
+    sim = cls.__new__(cls)
+    Simulation.__init__(sim)
+    return sim
@@ -0,0 +1,274 @@
+import sys
+
+import numpy as np
+
+from .quantity import Quantity, _uids
+from .heartbeat_object import HeartbeatObject
+
+
+def issparse(value):
+    """returns True if `value` is a `scipy.sparse` matrix or array.
+
+    This does not import scipy: if `scipy.sparse` was never imported,
+    `value` cannot be one of its objects.
+    """
+    sparse = sys.modules.get('scipy.sparse', None)
+    return sparse is not None and sparse.issparse(value)
+
+
+class SparseQuantity(HeartbeatObject):
+    """Quantity stored as `scipy.sparse` matrix.
+
+    It has the same attributes as a `Quantity` (info, owner, constant,
+    version, and the updaters), the matrix itself is `value`. Updaters can
+    either change `value` in place or assign a new matrix with `setvalue`.
+    Snapshots taken by a `DataUpdater` are stored as list of sparse matrices.
+
+    Parameters
+    ----------
+
+    value : scipy.sparse matrix | SparseQuantity
+        the matrix
+
+    info, owner, updater, systoler, diastoler, constant :
+        see `Quantity`
+
+    copy : bool, optional, defaults to False
+        whether to store a copy of the matrix
+
+    format : str, optional
+        sparse format to convert the matrix to, e.g. 'csr'
+    """
+
+    def __init__(self, value, info=None, owner=None, updater=None, systoler=None,
+                 diastoler=None, constant=None, copy=False, format=None):
+
+        if isinstance(value, SparseQuantity):
+            self.info = value.info
+            self.owner = value.owner
+            self._constant = value._constant
+            self._updater = value._updater
+            self._systoler = value._systoler
+            self._diastoler = value._diastoler
+            value = value.value
+        else:
+            self.info = None
+            self.owner = None
+            self._constant = False
+
+        if not issparse(value):
+            raise TypeError('value must be a scipy.sparse matrix')
+
+        if format is not None and value.format != format:
+            value = value.asformat(format)
+        elif copy:
+            value = value.copy()
+
+        self.value = value
+        self._version = 0
+        self._journal = None
+        self._uid = next(_uids)
+
+        self.info = info or self.info
+        self.owner = owner or self.owner
+
+        if constant is not None:
+            self._constant = constant
+
+        self.updater = updater or self.updater
+        self.systoler = systoler or self.systoler
+        self.diastoler = diastoler or self.diastoler
+
+    def __getstate__(self):
+        "like for a `Quantity`, the owner and the rollback journal are not pickled"
+        state = dict(self.__dict__, owner=None, _journal=None)
+        state.pop('_uid', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._uid = next(_uids)
+
+    def __repr__(self):
+        rep = "{}SparseQuantity({}, shape={}, nnz={})".format(
+            "Constant " if self._constant else "",
+            self.value.format, self.shape, self.nnz)
+        if self.info is not None:
+            rep = rep.replace("SparseQuantity", f"{self.info}\n")
+        return rep
+
+    def __matmul__(self, other):
+        return self.value @ other
+
+    @property
+    def shape(self):
+        return self.value.shape
+
+    @property
+    def dtype(self):
+        return self.value.dtype
+
+    @property
+    def nnz(self):
+        return self.value.nnz
+
+    @property
+    def nbytes(self):
+        "the memory of the stored values and indices in bytes"
+        return _sparse_nbytes(self.value)
+
+    @property
+    def constant(self):
+        return self._constant
+
+    @property
+    def version(self):
+        "the number of modifications of this SparseQuantity"
+        return self._version
+
+    @property
+    def uid(self):
+        "a number that identifies this SparseQuantity object, see `Quantity.uid`"
+        return self._uid
+
+    def toarray(self):
+        "returns the dense array"
+        return self.value.toarray()
+
+    def snapshot(self):
+        "returns a copy of the matrix, used by `DataUpdater`"
+        return self.value.copy()
+
+    def copy(self):
+        "returns a SparseQuantity with the same attributes and a copy of the matrix"
+        return SparseQuantity(self, copy=True)
+
+    def view(self):
+        "returns a SparseQuantity with the same attributes sharing the matrix"
+        return SparseQuantity(self)
+
+    def astype(self, dtype, copy=True):
+        "returns a SparseQuantity with values of type `dtype`"
+        if not copy and self.value.dtype == dtype:
+            return self
+        q = self.view()
+        q.value = self.value.astype(dtype)
+        return q
+
+    def setvalue(self, value):
+        """sets the matrix to `value` (sparse or dense), keeping the sparse format"""
+        if self._constant:
+            raise TypeError("This SparseQuantity is constant.")
+        if self._journal is not None:
+            self._journal.save(self)
+
+        fmt = self.value.format
+        if issparse(value):
+            value = value.asformat(fmt, copy=True)
+        else:
+            value = type(self.value)(np.broadcast_to(value, self.shape))
+
+        self.value = value.astype(self.dtype, copy=False)
+        self._version += 1
+
+    def systole(self):
+        "call the Systole updater"
+        if self._systoler is not None:
+            self._systoler.update(self)
+            self._version += 1
+
+    def update(self):
+        "call the Updater to do the update"
+        if self._updater is not None:
+            self._updater.update(self)
+            self._version += 1
+
+    def diastole(self):
+        "call the Diastole updater"
+        if self._diastoler is not None:
+            self._diastoler.update(self)
+            self._version += 1
+
+
+def _sparse_nbytes(matrix):
+    "memory of the arrays holding the values and indices of a sparse matrix"
+    return sum(getattr(matrix, attr).nbytes
+               for attr in ['data', 'indices', 'indptr', 'row', 'col', 'offsets']
+               if isinstance(getattr(matrix, attr, None), np.ndarray))
+
+
+class BandedQuantity(Quantity):
+    """Quantity holding a square banded matrix in compact form.
+
+    The array has the shape `(lower + upper + 1, n)` and holds the diagonals
+    in the layout of `scipy.linalg.solve_banded`: the element `(i, j)` of the
+    full matrix is stored at `[upper + i - j, j]`. Everything else works like
+    for a `Quantity`, so snapshots of a `DataUpdater` store the compact form.
+
+    Parameters
+    ----------
+
+    input_array : array
+        the diagonals in compact form
+
+    lower, upper : int
+        number of non-zero diagonals below and above the main diagonal
+
+    other keywords are passed to `Quantity`
+    """
+
+    def __new__(cls, input_array, lower, upper, **kwargs):
+        obj = super().__new__(cls, input_array, **kwargs)
+        if obj.ndim != 2 or obj.shape[0] != lower + upper + 1:
+            raise ValueError(f'banded storage needs shape ({lower + upper + 1}, n)')
+        obj.lower = lower
+        obj.upper = upper
+        return obj
+
+    def __array_finalize__(self, obj):
+        super().__array_finalize__(obj)
+        self.lower = getattr(obj, 'lower', None)
+        self.upper = getattr(obj, 'upper', None)
+
+    @classmethod
+    def from_dense(cls, matrix, lower, upper, **kwargs):
+        "creates the compact form of the square array `matrix`"
+        matrix = np.asarray(matrix)
+        n = matrix.shape[0]
+        bands = np.zeros((lower + upper + 1, n), dtype=matrix.dtype)
+        for d in range(-lower, upper + 1):
+            if d >= 0:
+                bands[upper - d, d:] = np.diagonal(matrix, d)
+            else:
+                bands[upper - d, :n + d] = np.diagonal(matrix, d)
+        return cls(bands, lower, upper, **kwargs)
+
+    def toarray(self):
+        "returns the full matrix as `np.ndarray`"
+        bands = self.view(np.ndarray)
+        n = bands.shape[1]
+        matrix = np.zeros((n, n), dtype=self.dtype)
+        for d in range(-self.lower, self.upper + 1):
+            if d >= 0:
+                matrix[np.arange(n - d), np.arange(d, n)] = bands[self.upper - d, d:]
+            else:
+                matrix[np.arange(-d, n), np.arange(n + d)] = bands[self.upper - d, :n + d]
+        return matrix
+
+    def dot(self, x):
+        "returns the product of the full matrix with the vector `x`"
+        bands = self.view(np.ndarray)
+        x = np.asarray(x)
+        n = bands.shape[1]
+        y = np.zeros(n, dtype=np.result_type(bands, x))
+        for d in range(-self.lower, self.upper + 1):
+            if d >= 0:
+                y[:n - d] += bands[self.upper - d, d:] * x[d:]
+            else:
+                y[-d:] += bands[self.upper - d, :n + d] * x[:n + d]
+        return y
+
+    def solve(self, b):
+        "solves `A x = b` for `x` with `scipy.linalg.solve_banded`"
+        from scipy.linalg import solve_banded
+        return solve_banded((self.lower, self.upper), self.view(np.ndarray), b)
@@ -0,0 +1,180 @@
+import collections
+import json
+import os
+import time
+
+
+class Tracer:
+    """
+    Collects timing events of a `Simulation` and passes them to sinks.
+
+    A tracer is attached with `sim.tracer = Tracer(...)`. Every call of
+    `sim.update()` then emits one event for each called systole, update, and
+    diastole, and one event for the whole step. Each event is a dictionary
+
+        {'step': 0, 'phase': 'update', 'quantity': 'y',
+         'start': 0.001, 'duration': 0.0002, 'dt': 1.0}
+
+    where `quantity` is `None` for the updaters of the simulation itself and
+    for the `'step'` event, `start` is measured in seconds since the tracer
+    was created, and `dt` is the value of the simulation quantity `dt` (or
+    `None` if there is no such quantity).
+
+    Parameters
+    ----------
+
+    sinks : list, optional
+        objects with an `emit(event)` method. Defaults to a single `RingBuffer`.
+
+    clock : callable, optional, defaults to `time.perf_counter`
+        function returning the current time in seconds
+    """
+
+    def __init__(self, sinks=None, clock=time.perf_counter):
+        if sinks is None:
+            sinks = [RingBuffer()]
+        self.sinks = list(sinks)
+        self.clock = clock
+        self.t0 = clock()
+
+    def emit(self, event):
+        "pass `event` on to all sinks"
+        for sink in self.sinks:
+            sink.emit(event)
+
+    def record(self, step, phase, quantity, start, stop, dt=None):
+        "create an event from the given timings and emit it"
+        self.emit({
+            'step': step,
+            'phase': phase,
+            'quantity': quantity,
+            'start': start - self.t0,
+            'duration': stop - start,
+            'dt': dt,
+        })
+
+    def close(self):
+        "close all sinks that can be closed"
+        for sink in self.sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
+
+    @property
+    def events(self):
+        "the events of the first sink that keeps events in memory"
+        for sink in self.sinks:
+            if isinstance(sink, RingBuffer):
+                return sink.events
+        return []
+
+
+class RingBuffer:
+    """
+    Keeps the last `maxlen` events in memory.
+
+    Parameters
+    ----------
+
+    maxlen : int, optional, defaults to 10000
+        number of events to keep, older events are dropped
+    """
+
+    def __init__(self, maxlen=10000):
+        self._buffer = collections.deque(maxlen=maxlen)
+
+    def emit(self, event):
+        self._buffer.append(event)
+
+    def clear(self):
+        self._buffer.clear()
+
+    @property
+    def events(self):
+        "list of the stored events, oldest first"
+        return list(self._buffer)
+
+
+class _FileSink:
+    "base class for sinks that write to a path or an open file"
+
+    def __init__(self, file):
+        if isinstance(file, (str, os.PathLike)):
+            self._fid = open(file, 'w')
+            self._owns_file = True
+        else:
+            self._fid = file
+            self._owns_file = False
+
+    def close(self):
+        if self._fid is None:
+            return
+        self._fid.flush()
+        if self._owns_file:
+            self._fid.close()
+        self._fid = None
+
+
+class JSONLines(_FileSink):
+    """
+    Writes every event as one line of JSON.
+
+    Parameters
+    ----------
+
+    file : str | path | file object
+        where to write the events. Files opened from a path are closed
+        by `close()`.
+    """
+
+    def emit(self, event):
+        self._fid.write(json.dumps(event) + '\n')
+
+
+class ChromeTrace(_FileSink):
+    """
+    Writes events in the Chrome trace-event format.
+
+    The result can be opened in `chrome://tracing` or https://ui.perfetto.dev.
+    The JSON array is only terminated by `close()`, but both viewers also
+    read unterminated files of crashed runs.
+
+    Parameters
+    ----------
+
+    file : str | path | file object
+        where to write the trace
+
+    pid : int, optional
+        the process id shown in the viewer, defaults to the current process
+    """
+
+    def __init__(self, file, pid=None):
+        super().__init__(file)
+        self.pid = os.getpid() if pid is None else pid
+        self._fid.write('[\n')
+        self._first = True
+
+    def emit(self, event):
+        name = event['phase']
+        if event['quantity'] is not None:
+            name += ':' + event['quantity']
+
+        entry = {
+            'name': name,
+            'cat': event['phase'],
+            'ph': 'X',
+            'ts': event['start'] * 1e6,
+            'dur': event['duration'] * 1e6,
+            'pid': self.pid,
+            'tid': 0,
+            'args': {'step': event['step'], 'dt': event['dt']},
+        }
+
+        sep = '' if self._first else ',\n'
+        self._first = False
+        self._fid.write(sep + json.dumps(entry))
+
+    def close(self):
+        if self._fid is not None:
+            self._fid.write('\n]\n')
+        super().close()
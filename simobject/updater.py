@@ -1,3 +1,5 @@
+from collections import OrderedDict, namedtuple
+
 import numpy as np
 
 
@@ -11,7 +13,11 @@ class Updater:
     func : callable
         the owner (e.g. simulation) that this Updater is attached to.
 
+    Updaters that change other quantities than the one they are attached to
+    can list their names in `writes`, so that they are copied before
+    transactional updates (see `Simulation.transactional`).
     """
+    writes = None
 
     def __init__(self, func=None):
         self.func = func
@@ -37,13 +43,18 @@ class DataUpdater(Updater):
             string = 'time = {0.time}'
 
         will access simulation.time.
+
+    dtype : data-type, optional
+        the dtype in which the snapshots are stored. By default, the
+        dtype of each quantity is kept.
     """
     keys = []
 
-    def __init__(self, keys, *args, string=None, **kwargs):
+    def __init__(self, keys, *args, string=None, dtype=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.keys = list(keys)
         self.string = string
+        self.dtype = dtype
 
     def print(self, sim):
         if self.string is not None:
@@ -56,9 +67,209 @@ class DataUpdater(Updater):
         self.print(sim)
 
         for key in self.keys:
-            if key in sim.data:
-                sim.data[key] = np.vstack(
-                    (sim.data[key], getattr(sim, key))
-                )
-            else:
-                sim.data[key] = np.array(getattr(sim, key)[None, ...])
+            self.append(sim, key, getattr(sim, key))
+
+    def append(self, sim, key, value):
+        "appends `value` to the snapshots of `key` in `sim.data`"
+        if hasattr(value, 'snapshot'):
+
+            # sparse quantities keep a list of sparse matrices, which is
+            # replaced instead of appended to, like the arrays below
+
+            sim.data[key] = sim.data.get(key, []) + [value.snapshot()]
+            return
+
+        value = np.asarray(value, dtype=self.dtype)
+        if key in sim.data:
+            sim.data[key] = np.vstack(
+                (sim.data[key], value)
+            )
+        else:
+            sim.data[key] = np.array(value[None, ...])
+
+
+def _raw(q):
+    """return the plain `np.ndarray` buffer of `q`, or a scalar for 0-d data"""
+    arr = q.view(np.ndarray) if isinstance(q, np.ndarray) else np.asarray(q)
+    if arr.ndim == 0:
+        return arr[()]
+    return arr
+
+
+def _jit(func, options):
+    """compile `func` with `numba.njit` if numba is available.
+
+    Returns the compiled function and a flag whether compilation is used.
+    If numba cannot be imported, `func` is returned unchanged.
+    """
+    try:
+        import numba
+    except ImportError:
+        return func, False
+    return numba.njit(**options)(func), True
+
+
+class KernelUpdater(Updater):
+    """
+    Updater that calls a kernel with raw numpy buffers instead of Quantities.
+
+    The kernel is called positionally with the plain `np.ndarray` buffers
+    (0-d quantities are passed as scalars) of all quantities named in `reads`.
+    It never sees a `Quantity` or the simulation object, so it can be compiled
+    with `numba.njit` or any other kernel compiler.
+
+    The return value of the kernel is written to the quantities named in
+    `writes`. If `writes` is not given, it is written to the quantity to which
+    this updater is attached. If the kernel returns `None`, nothing is
+    written, which allows kernels to fill (some of) their arguments in-place.
+
+    Parameters
+    ----------
+
+    func : callable
+        the kernel, called as `func(*buffers)`
+
+    reads : list
+        names of the quantities passed to the kernel, in that order
+
+    writes : list, optional
+        names of the quantities that receive the return value(s). If more
+        than one name is given, the kernel needs to return a tuple.
+
+    jit : bool | dict, optional, defaults to False
+        if True (or a dict of options for `numba.njit`), the kernel is
+        compiled with numba. If numba is not installed, the plain python/numpy
+        function is used instead.
+    """
+
+    def __init__(self, func, reads=(), writes=None, jit=False):
+        self.reads = list(reads)
+        self.writes = None if writes is None else list(writes)
+        self.pyfunc = func
+
+        if jit:
+            func, self.compiled = _jit(func, jit if isinstance(jit, dict) else {})
+        else:
+            self.compiled = False
+
+        super().__init__(func=func)
+
+    def update(self, obj):
+        # quantities look up their siblings through their owner,
+        # a simulation uses itself
+
+        owner = getattr(obj, 'owner', None)
+        sim = obj if owner is None else owner
+
+        result = self.func(*[_raw(getattr(sim, key)) for key in self.reads])
+
+        if result is None:
+            return
+
+        if self.writes is None:
+            obj.setvalue(result)
+        elif len(self.writes) == 1:
+            getattr(sim, self.writes[0]).setvalue(result)
+        else:
+            for key, value in zip(self.writes, result):
+                getattr(sim, key).setvalue(value)
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize', 'nbytes'])
+
+
+class CachedUpdater(Updater):
+    """
+    Updater that remembers the results of an expensive, pure update function.
+
+    Before calling `func`, the quantities named in `inputs` are fingerprinted,
+    either by hashing their dtype, shape, and memory, or by their `Quantity.uid`
+    and `Quantity.version`, which is much cheaper for large inputs but only works
+    if the inputs are changed in ways that increase their version. If the same
+    fingerprint was seen before, the stored result is copied into the updated quantity instead
+    of calling `func`. The results are kept in a least-recently-used cache that
+    is bounded in number of entries and in memory.
+
+    `func` has to depend only on the declared inputs: if it uses the old value
+    of the updated quantity itself, that quantity needs to be in `inputs`.
+
+    Parameters
+    ----------
+
+    func : callable
+        the update function, called as `func(obj)` like for an `Updater`
+
+    inputs : list
+        names of the owner's quantities that the result depends on
+
+    maxsize : int, optional, defaults to 128
+        maximum number of cached results
+
+    maxbytes : int, optional
+        maximum memory of the cached results in bytes, unbounded if None
+
+    by : str, optional, defaults to 'hash'
+        how to fingerprint the inputs, 'hash' or 'version'
+    """
+
+    def __init__(self, func, inputs=(), maxsize=128, maxbytes=None, by='hash'):
+        if by not in ['hash', 'version']:
+            raise ValueError("<by> must be 'hash' or 'version'")
+        super().__init__(func=func)
+        self.inputs = list(inputs)
+        self.by = by
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.cache_clear()
+
+    def fingerprint(self, sim):
+        "returns the cache key of the current inputs in `sim`"
+        if self.by == 'version':
+            return tuple((q.uid, q.version) for q in
+                         (getattr(sim, key) for key in self.inputs))
+
+        import hashlib
+
+        h = hashlib.blake2b(digest_size=16)
+        for key in self.inputs:
+            arr = np.ascontiguousarray(getattr(sim, key))
+            h.update(f'{arr.dtype.str}{arr.shape}'.encode())
+            h.update(arr.view(np.ndarray).data.cast('B'))
+        return h.digest()
+
+    def update(self, obj):
+        owner = getattr(obj, 'owner', None)
+        sim = obj if owner is None else owner
+
+        key = self.fingerprint(sim)
+        result = self._cache.get(key, None)
+
+        if result is not None:
+            self._hits += 1
+            self._cache.move_to_end(key)
+            obj.setvalue(result)
+            return
+
+        self._misses += 1
+        self.func(obj)
+
+        result = np.array(obj.view(np.ndarray), copy=True)
+        self._cache[key] = result
+        self._nbytes += result.nbytes
+
+        while len(self._cache) > self.maxsize or (
+                self.maxbytes is not None and self._nbytes > self.maxbytes):
+            _, old = self._cache.popitem(last=False)
+            self._nbytes -= old.nbytes
+
+    def cache_info(self):
+        "returns the hits, misses, maximum size, current size, and memory in bytes"
+        return CacheInfo(self._hits, self._misses, self.maxsize,
+                         len(self._cache), self._nbytes)
+
+    def cache_clear(self):
+        "empties the cache and resets the statistics"
+        self._cache = OrderedDict()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
@@ -0,0 +1,78 @@
+from simobject import Quantity, Simulation
+
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+
+def get_sim():
+    sim = Simulation()
+    sim.addQuantity('time', Quantity(0, 'simulation time'))
+    sim.addQuantity('y', Quantity(np.zeros(3), 'y value'))
+    sim.threads = set()
+
+    def timeupdate(time):
+        time += 1
+
+    def yupdate(y):
+        y.owner.threads.add(threading.get_ident())
+        y += 1
+
+    sim.time.updater = timeupdate
+    sim.y.updater = yupdate
+    return sim
+
+
+def test_arun():
+    "the stepping yields to other tasks"
+    sim = get_sim()
+    seen = []
+
+    async def watch():
+        while sim.step < 3:
+            seen.append(int(sim.step))
+            await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(sim.arun(3), watch())
+
+    asyncio.run(main())
+
+    assert sim.time == 3
+    assert np.all(sim.y == 3)
+    assert set(seen) == {0, 1, 2}
+
+
+def test_aupdate_offload():
+    "offloaded updaters run in the executor"
+    sim = get_sim()
+
+    async def main():
+        await sim.aupdate(offload=['y'])
+
+    asyncio.run(main())
+
+    assert sim.time == 1
+    assert np.all(sim.y == 1)
+    assert threading.get_ident() not in sim.threads
+
+
+def test_arun_cancel():
+    "cancelling stops at a step boundary"
+    sim = get_sim()
+
+    async def main():
+        task = asyncio.ensure_future(sim.arun(1000))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+    assert 0 < sim.step < 1000
+    assert sim.time == sim.step
+    assert np.all(sim.y == sim.step)
@@ -0,0 +1,98 @@
+from simobject import Quantity, Simulation, CachedUpdater
+
+import numpy as np
+
+
+def get_sim():
+    sim = Simulation()
+    sim.addQuantity('T', Quantity(np.full(5, 10.0), 'temperature'))
+    sim.addQuantity('kappa', Quantity(np.zeros(5), 'opacity'))
+    calls = []
+
+    def opacity(kappa):
+        calls.append(1)
+        kappa.setvalue(kappa.owner.T ** 2)
+
+    sim.kappa.updater = CachedUpdater(opacity, inputs=['T'], maxsize=2)
+    sim.update_order = ['kappa']
+    return sim, calls
+
+
+def test_cache_hits():
+    "identical inputs reuse the stored result"
+    sim, calls = get_sim()
+    sim.update()
+    sim.kappa = 0.0
+    sim.update()
+
+    assert len(calls) == 1
+    assert np.all(sim.kappa == 100.0)
+
+    info = sim.kappa.updater.cache_info()
+    assert info.hits == 1
+    assert info.misses == 1
+    assert info.currsize == 1
+    assert info.nbytes == sim.kappa.nbytes
+
+
+def test_cache_changed_input():
+    "changed inputs are recomputed, old entries are evicted"
+    sim, calls = get_sim()
+
+    for T in [1.0, 2.0, 3.0, 1.0, 3.0]:
+        sim.T = T
+        sim.update()
+        assert np.all(sim.kappa == T**2)
+
+    info = sim.kappa.updater.cache_info()
+    assert len(calls) == 4
+    assert info.hits == 1
+    assert info.currsize == 2
+
+
+def test_cache_maxbytes():
+    "the cache memory is bounded"
+    sim, calls = get_sim()
+    u = sim.kappa.updater
+    u.maxbytes = sim.kappa.nbytes
+
+    for T in [1.0, 2.0, 2.0]:
+        sim.T = T
+        sim.update()
+
+    assert u.cache_info().currsize == 1
+    assert u.cache_info().hits == 1
+
+    u.cache_clear()
+    assert u.cache_info() == (0, 0, 2, 0, 0)
+
+
+def test_cache_by_version():
+    "the inputs can be fingerprinted by their version"
+    sim, calls = get_sim()
+    sim.kappa.updater = CachedUpdater(sim.kappa.updater.func, inputs=['T'], by='version')
+
+    sim.update()
+    sim.update()
+    assert len(calls) == 1
+
+    sim.T += 1
+    sim.update()
+    assert len(calls) == 2
+    assert np.all(sim.kappa == 121.0)
+
+
+def test_cache_by_version_replaced_inputs():
+    "replaced inputs start at version 0 again, but are never mistaken for the old ones"
+    sim, calls = get_sim()
+    sim.kappa.updater = CachedUpdater(sim.kappa.updater.func, inputs=['T'], by='version')
+
+    for i in range(20):
+        sim.T += 1
+        sim.update()
+        assert np.all(sim.kappa == (11.0 + i)**2)
+
+    for i in range(20):
+        sim.T = Quantity(np.full(5, float(i)))
+        sim.update()
+        assert np.all(sim.kappa == float(i)**2)
@@ -0,0 +1,118 @@
+from simobject import DistributedSimulation, DistributedDataUpdater, LocalComm, run_local, Tracer
+
+import asyncio
+import pickle
+
+import numpy as np
+import pytest
+
+N = 11
+
+
+def initial():
+    return np.sin(np.linspace(0, np.pi, N))**2 + np.linspace(0, 1, N)
+
+
+def diffuse(y):
+    y[1:-1] = y[1:-1] + 0.25 * (y[:-2] - 2 * y[1:-1] + y[2:])
+
+
+def serial(nsteps):
+    "the same diffusion without decomposition"
+    y = np.pad(initial(), 1, mode='edge')
+    for _ in range(nsteps):
+        diffuse(y)
+    return y[1:-1]
+
+
+def model(comm, nsteps, gather, mode='update'):
+    sim = DistributedSimulation(comm=comm, ghost=1)
+    sim.add_distributed('y', initial(), updater=diffuse)
+    sim.addQuantity('time', 0.0)
+    sim.diastoler = DistributedDataUpdater(['y', 'time'], gather=gather)
+
+    if mode == 'traced':
+        sim.tracer = Tracer()
+    if mode == 'async':
+        asyncio.run(sim.arun(nsteps))
+    else:
+        for _ in range(nsteps):
+            sim.update()
+
+    if mode == 'traced':
+        phases = [e['phase'] for e in sim.tracer.events if e['step'] == 0]
+        assert phases == ['exchange_halos', 'update', 'exchange_halos', 'diastole', 'step']
+
+    return sim.rank, sim.block('y'), sim.gather('y'), sim.data
+
+
+def test_single_rank():
+    "without communicator, a single rank gives the serial result"
+    rank, block, y, data = model(LocalComm(), 5, True)
+    assert rank == 0
+    assert block == (0, N)
+    assert np.allclose(y, serial(5))
+    assert data['y'].shape == (5, N)
+
+
+@pytest.mark.parametrize('nranks', [2, 3])
+def test_local_ranks(nranks):
+    "the halo exchange reproduces the serial result"
+    results = run_local(model, nranks, args=(5, True), timeout=60)
+
+    assert [r[0] for r in results] == list(range(nranks))
+    assert results[0][1][0] == 0
+    assert results[-1][1][1] == N
+
+    assert np.allclose(results[0][2], serial(5))
+    assert all(r[2] is None for r in results[1:])
+
+    data = results[0][3]
+    assert data['y'].shape == (5, N)
+    assert np.allclose(data['y'][-1], serial(5))
+    assert all(r[3] == {} for r in results[1:])
+
+
+@pytest.mark.parametrize('mode', ['traced', 'async'])
+def test_local_modes(mode):
+    "traced and asynchronous updates exchange the ghost rows too"
+    results = run_local(model, 2, args=(5, True, mode), timeout=60)
+    assert np.allclose(results[0][2], serial(5))
+
+
+def test_fork_pickle():
+    "forks and unpickled simulations keep their blocks and continue alike"
+    sim = DistributedSimulation(comm=LocalComm(), ghost=2)
+    sim.add_distributed('y', initial(), updater=diffuse)
+    sim.update()
+
+    fork = sim.fork()
+    sim2 = pickle.loads(pickle.dumps(sim))
+
+    for other in [fork, sim2]:
+        assert other.block('y') == (0, N)
+        assert other.interior('y').shape == (N,)
+        assert other.size == 1
+        other.update()
+
+    sim.update()
+    assert np.allclose(fork.gather('y'), sim.gather('y'))
+    assert np.allclose(sim2.gather('y'), sim.gather('y'))
+
+
+def test_local_parallel_data():
+    "without gathering, each rank stores its own block"
+    results = run_local(model, 2, args=(3, False), timeout=60)
+    y = np.hstack([r[3]['y'] for r in results])
+    assert np.allclose(y[-1], serial(3))
+    assert results[1][3]['time'].shape == (3, 1)
+
+
+def test_local_error():
+    "errors in the workers are raised"
+
+    def fail(comm):
+        raise ValueError('rank {}'.format(comm.rank))
+
+    with pytest.raises(RuntimeError, match='ValueError'):
+        run_local(fail, 2, timeout=60)
@@ -0,0 +1,79 @@
+from simobject import Quantity, Simulation, DataUpdater
+
+import numpy as np
+import pytest
+
+
+class Model(Simulation):
+    def grow(self, sim):
+        self.y = self.y * self.factor
+
+
+def get_sim():
+    sim = Model()
+    sim.addQuantity('x', Quantity(np.linspace(0, 1, 10), 'grid', constant=True))
+    sim.addQuantity('y', Quantity(np.ones(10), 'y value'))
+    sim.addQuantity('time', Quantity(0.0, 'time'))
+    sim.factor = 2.0
+
+    def timeupdate(time):
+        time += 1
+
+    sim.time.updater = timeupdate
+    sim.systoler = sim.grow
+    sim.diastoler = DataUpdater(['time', 'y'])
+    sim.update()
+    return sim
+
+
+def test_fork_shares_constants():
+    "constant quantities and the history are shared, mutables are not"
+    sim = get_sim()
+    fork = sim.fork()
+
+    assert type(fork) is Model
+    assert fork.x is not sim.x
+    assert np.shares_memory(fork.x, sim.x)
+    assert not np.shares_memory(fork.y, sim.y)
+    assert fork.data is not sim.data
+    assert fork.data['y'] is sim.data['y']
+    assert fork.step == sim.step == 1
+
+    # the shared memory cannot be changed from the fork
+
+    with pytest.raises(ValueError):
+        fork.x[0] = 5
+
+
+def test_fork_owner():
+    "the fork owns its quantities and its updaters act on the fork"
+    sim = get_sim()
+    fork = sim.fork()
+
+    for key in ['x', 'y', 'time']:
+        assert getattr(fork, key).owner is fork
+        assert getattr(sim, key).owner is sim
+
+    assert fork.x.info == 'grid'
+    assert fork.x.constant
+    assert fork.time.updater is sim.time.updater
+    assert fork.systoler.func.__self__ is fork
+
+
+def test_fork_independent():
+    "both simulations continue independently"
+    sim = get_sim()
+    fork = sim.fork()
+    fork.factor = 3.0
+
+    sim.update()
+    fork.update()
+    fork.update()
+
+    assert sim.time == 2
+    assert fork.time == 3
+    assert np.all(sim.y == 4)
+    assert np.all(fork.y == 18)
+    assert sim.data['y'].shape[0] == 2
+    assert fork.data['y'].shape[0] == 3
+    assert np.all(fork.data['y'][:2] == [[2], [6]])
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+import simobject
+
+# import time budget of `import simobject` in microseconds
+
+IMPORT_BUDGET = 50000
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(simobject.__file__)))
+
+
+def run(code, *flags):
+    "runs `code` in a new interpreter that finds this simobject, returns the process"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, *flags, '-c', code],
+                          capture_output=True, text=True, env=env, check=True)
+
+
+def cumulative_import_time(stderr, module):
+    "returns the cumulative import time in µs of `module` from the output of `-X importtime`"
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and line.split('|')[-1].strip() == module:
+            return int(line.split('|')[1])
+    raise ValueError(f'{module} not found')
+
+
+def test_import_time():
+    "importing simobject stays within the budget"
+    times = [cumulative_import_time(run('import simobject', '-X', 'importtime').stderr, 'simobject')
+             for _ in range(3)]
+    assert min(times) < IMPORT_BUDGET
+
+
+def test_import_is_lazy():
+    "numpy and optional dependencies are only imported when needed"
+    code = ('import sys, simobject; print(" ".join(sorted(sys.modules)))\n'
+            'from simobject import Simulation; print(" ".join(sorted(sys.modules)))\n')
+    after_import, after_simulation = [
+        set(line.split()) for line in run(code).stdout.splitlines()]
+
+    assert 'numpy' not in after_import
+    assert 'numpy' in after_simulation
+
+    for module in ['scipy', 'numba', 'mpi4py', 'asyncio', 'multiprocessing',
+                   'simobject.distributed', 'simobject.tracing']:
+        assert module not in after_simulation
+
+
+def test_lazy_attributes():
+    "all public names can be accessed and listed"
+    for name in simobject.__all__:
+        assert getattr(simobject, name).__name__ == name
+    assert set(simobject.__all__) <= set(dir(simobject))
+    assert simobject.DistributedSimulation.__module__ == 'simobject.distributed'
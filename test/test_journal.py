@@ -0,0 +1,104 @@
+from simobject import Quantity, Simulation, DataUpdater, Updater
+
+import numpy as np
+import pytest
+
+
+def get_sim():
+    sim = Simulation()
+    sim.addQuantity('x', Quantity(np.linspace(0, 1, 10), 'grid', constant=True))
+    sim.addQuantity('y', Quantity(np.ones(10), 'y value'))
+    sim.addQuantity('z', Quantity(np.zeros(10), 'z value'))
+    sim.addQuantity('time', Quantity(0.0, 'time'))
+
+    def timeupdate(time):
+        time += 1
+
+    def yupdate(y):
+        y[:] = y * 2
+        z = y.owner.z
+        z += 1
+
+    sim.time.updater = timeupdate
+    sim.y.updater = yupdate
+    sim.diastoler = DataUpdater(['time'])
+    return sim
+
+
+def test_rollback():
+    "a rolled back step leaves no trace"
+    sim = get_sim()
+    sim.transactional = True
+    sim.update()
+    sim.commit()
+
+    version = sim.y.version
+    sim.update()
+
+    assert sim.time == 2
+    assert np.all(sim.y == 4)
+    assert np.all(sim.z == 2)
+
+    sim.rollback()
+
+    assert sim.step == 1
+    assert sim.time == 1
+    assert np.all(sim.y == 2)
+    assert np.all(sim.z == 1)
+    assert sim.data['time'].shape == (1,)
+    assert sim.y.version > version
+
+    with pytest.raises(RuntimeError):
+        sim.rollback()
+
+
+def test_only_written_quantities_saved():
+    "constant quantities are not copied, buffers are reused"
+    sim = get_sim()
+    sim.transactional = True
+    journal = sim._journal
+
+    sim.update()
+    buffers = dict(journal._buffers)
+    sim.update()
+    sim.commit()
+
+    assert journal.nbytes == sim.y.nbytes + sim.z.nbytes + sim.time.nbytes
+    assert all(journal._buffers[key] is buf for key, buf in buffers.items())
+    assert sim.y._journal is None
+
+
+def test_declared_writes():
+    "quantities changed through raw memory are restored if declared"
+    sim = get_sim()
+
+    def raw(sim):
+        sim.z.view(np.ndarray)[:] = 5
+
+    sim.systoler = Updater(raw)
+    sim.systoler.writes = ['z']
+    sim.transactional = True
+    sim.update()
+    assert np.all(sim.z == 6)
+
+    sim.rollback()
+    assert np.all(sim.z == 0)
+
+
+def test_replaced_quantity():
+    "a quantity replaced during a step is put back"
+    sim = get_sim()
+    sim.transactional = True
+    y = sim.y
+    sim.update()
+    sim.y = Quantity(np.arange(10))
+    sim.rollback()
+
+    assert sim.y is y
+    assert np.all(sim.y == 1)
+
+    sim.transactional = False
+    sim.update()
+    assert np.all(sim.y == 2)
+    with pytest.raises(RuntimeError):
+        sim.commit()
@@ -0,0 +1,75 @@
+from simobject import Quantity, Simulation, KernelUpdater
+
+import numpy as np
+
+
+def get_sim():
+    sim = Simulation()
+    sim.addQuantity('x', np.linspace(0, 1, 5), constant=True)
+    sim.addQuantity('y', np.ones(5))
+    sim.addQuantity('dt', 0.5)
+    return sim
+
+
+def test_kernel_gets_raw_buffers():
+    "the kernel is called with plain arrays and scalars"
+    sim = get_sim()
+    args = []
+
+    def kernel(x, dt):
+        args.extend([x, dt])
+        return x * dt
+
+    sim.y.updater = KernelUpdater(kernel, reads=['x', 'dt'])
+    sim.update()
+
+    assert type(args[0]) is np.ndarray
+    assert not isinstance(args[1], np.ndarray)
+    assert args[1] == 0.5
+    assert isinstance(sim.y, Quantity)
+    assert np.allclose(sim.y, 0.5 * sim.x)
+
+
+def test_kernel_multiple_writes():
+    "a tuple returned by the kernel is distributed to `writes`"
+    sim = get_sim()
+    sim.addQuantity('z', np.zeros(5))
+
+    def kernel(x, y):
+        return x + y, x - y
+
+    sim.systoler = KernelUpdater(kernel, reads=['x', 'y'], writes=['y', 'z'])
+    sim.update()
+
+    assert np.allclose(sim.y, sim.x + 1)
+    assert np.allclose(sim.z, sim.x - 1)
+
+
+def test_kernel_inplace():
+    "kernels returning None may write into their buffers"
+    sim = get_sim()
+
+    def kernel(y, dt):
+        for i in range(y.shape[0]):
+            y[i] += dt
+
+    sim.y.updater = KernelUpdater(kernel, reads=['y', 'dt'])
+    sim.update()
+
+    assert np.allclose(sim.y, 1.5)
+
+
+def test_kernel_jit_fallback():
+    "with or without numba, a jit kernel gives the same result"
+    sim = get_sim()
+
+    def kernel(y, dt):
+        return y * (1.0 + dt)
+
+    u = KernelUpdater(kernel, reads=['y', 'dt'], jit=True)
+    sim.y.updater = u
+    sim.update()
+
+    assert u.pyfunc is kernel
+    assert u.compiled is (u.func is not kernel)
+    assert np.allclose(sim.y, 1.5)
@@ -0,0 +1,99 @@
+from simobject import Quantity, Simulation, DataUpdater, MemoryBudget, MemoryBudgetExceeded
+
+import numpy as np
+import pytest
+
+
+def get_sim():
+    sim = Simulation()
+    sim.addQuantity('x', Quantity(np.zeros(100), 'grid', constant=True))
+    sim.addQuantity('y', Quantity(np.ones(100), 'y value'))
+    sim.addQuantity('time', Quantity(0.0, 'time'))
+
+    def timeupdate(time):
+        time += 1
+
+    sim.time.updater = timeupdate
+    sim.diastoler = DataUpdater(['y', 'time'])
+    return sim
+
+
+def test_memory_report():
+    "the memory is reported per quantity, data entry, and category"
+    sim = get_sim()
+    sim.update()
+    sim.update()
+
+    report = sim.memory_report()
+
+    assert report['quantities'] == {'x': 800, 'y': 800, 'time': 8}
+    assert report['data'] == {'y': 1600, 'time': 16}
+    assert report['constant'] == 800
+    assert report['mutable'] == 808
+    assert report['history'] == 1616
+    assert report['total'] == 3224
+
+
+def test_budget_raise():
+    "exceeding the budget raises"
+    sim = get_sim()
+    sim.memory_budget = MemoryBudget(3000)
+    sim.update()
+
+    with pytest.raises(MemoryBudgetExceeded):
+        sim.update()
+
+    with pytest.raises(MemoryError):
+        sim.update()
+
+
+def test_budget_decimate():
+    "the history is thinned out to stay within the budget"
+    sim = get_sim()
+    sim.data['params'] = np.arange(5.)
+    sim.memory_budget = MemoryBudget(5000, policy='decimate')
+
+    for _ in range(6):
+        sim.update()
+
+    assert sim.memory_report()['total'] <= 5000
+    assert np.all(sim.data['time'][:, 0] == [1, 3, 5])
+    assert np.all(sim.memory_budget.kept['y'] == [0, 2, 4])
+
+    # later snapshots keep the spacing
+
+    for _ in range(6):
+        sim.update()
+
+    assert sim.memory_report()['total'] <= 5000
+    assert sim.memory_budget.stride == 4
+    assert np.all(sim.data['time'][:, 0] == [1, 5, 9])
+    assert np.all(sim.memory_budget.kept['time'] == [0, 4, 8])
+    assert np.all(sim.data['params'] == np.arange(5.))
+
+
+def test_budget_spill(tmp_path):
+    "the history is written to disk and can be loaded again"
+    sim = get_sim()
+    sim.data['params'] = np.arange(5.)
+    budget = MemoryBudget(5000, policy='spill', spill_dir=tmp_path)
+    sim.memory_budget = budget
+
+    for _ in range(6):
+        sim.update()
+
+    assert sim.memory_report()['total'] <= 5000
+    assert np.all(sim.data['params'] == np.arange(5.))
+    assert 'params' not in budget.spilled
+    assert len(budget.spilled['time']) == 1
+    assert np.all(budget.load('time', sim)[:, 0] == [1, 2, 3, 4, 5, 6])
+    assert budget.load('y', sim).shape == (6, 100)
+
+
+def test_budget_too_small(tmp_path):
+    "if the quantities alone are too large, spilling does not help"
+    sim = get_sim()
+    sim.memory_budget = MemoryBudget(1000, policy='spill', spill_dir=tmp_path)
+
+    with pytest.raises(MemoryBudgetExceeded):
+        sim.update()
@@ -0,0 +1,97 @@
+from simobject import Quantity, Simulation, Updater, DataUpdater
+
+import copy
+import pickle
+import numpy as np
+
+
+def double(field):
+    field.setvalue(field * 2)
+
+
+def get_sim():
+    sim = Simulation()
+    sim.addQuantity('x', Quantity(np.linspace(0, 1, 100), 'grid', constant=True))
+    sim.addQuantity('y', Quantity(np.ones(100), 'y value', updater=double))
+    sim.addQuantity('time', Quantity(0.0, 'time'))
+    sim.diastoler = DataUpdater(['y'])
+    sim.update_order = ['y']
+    sim.parameter = 5
+    sim.update()
+    return sim
+
+
+def test_pickle_quantity():
+    "a pickled quantity keeps its attributes"
+    u = Updater(double)
+    q = Quantity([1., 2.], info='a', constant=True, updater=u)
+    q2 = pickle.loads(pickle.dumps(q))
+
+    assert type(q2) is Quantity
+    assert np.all(q2 == q)
+    assert q2.info == 'a'
+    assert q2.constant
+    assert q2.updater.func is double
+
+
+def test_pickle_simulation():
+    "a pickled simulation can be continued"
+    sim = get_sim()
+    sim2 = pickle.loads(pickle.dumps(sim))
+
+    assert sim2.step == 1
+    assert sim2.parameter == 5
+    assert sim2.update_order == ['y']
+    assert sim2.x.constant
+    assert sim2.x.info == 'grid'
+
+    for key in ['x', 'y', 'time']:
+        assert getattr(sim2, key).owner is sim2
+
+    sim.update()
+    sim2.update()
+    assert np.all(sim2.y == sim.y)
+    assert np.all(sim2.data['y'] == sim.data['y'])
+
+
+def test_pickle_out_of_band():
+    "with protocol 5 the array buffers are not copied"
+    sim = get_sim()
+    buffers = []
+    s = pickle.dumps(sim, protocol=5, buffer_callback=buffers.append)
+
+    # x, y, time, and the history of y
+
+    assert len(buffers) == 4
+    assert sim.x.tobytes() not in s
+    assert sum(b.raw().nbytes for b in buffers) == 2 * sim.y.nbytes + sim.x.nbytes + sim.time.nbytes
+
+    sim2 = pickle.loads(s, buffers=buffers)
+
+    assert np.shares_memory(sim2.y, sim.y)
+    assert sim2.y.owner is sim2
+    assert sim2.x.info == 'grid'
+
+
+def test_pickle_slice_without_owner():
+    "slices and results of arithmetic are pickled without their simulation"
+    sim = get_sim()
+    sim.addQuantity('big', np.zeros(100000), constant=True)
+    sim.time.updater = lambda t: t.setvalue(t + 1)
+
+    part = pickle.loads(pickle.dumps(sim.y[2:4]))
+    assert part.owner is None
+    assert part.info == 'y value'
+    assert np.all(part == sim.y[2:4])
+
+    assert len(pickle.dumps(sim.x * 2)) < sim.big.nbytes
+
+
+def test_copy_keeps_owner():
+    "copy.copy does not take over the quantities of the original"
+    sim = get_sim()
+    sim2 = copy.copy(sim)
+
+    assert sim.y.owner is sim
+    assert sim2.y.owner is sim2
+    assert sim2.y is not sim.y
@@ -0,0 +1,91 @@
+from simobject import Quantity, Simulation, DataUpdater
+
+import numpy as np
+
+
+def get_sim():
+    sim = Simulation(dtype=np.float32, dtypes={'time': np.float64})
+    sim.addQuantity('nx', 10, constant=True)
+    sim.addQuantity('y', np.ones(10))
+    sim.addQuantity('time', 0.0)
+    sim.addQuantity('dt', 0.1)
+    return sim
+
+
+def test_default_dtype():
+    "floats use the simulation dtype, other types and pinned quantities do not"
+    sim = get_sim()
+
+    assert sim.y.dtype == np.float32
+    assert sim.dt.dtype == np.float32
+    assert sim.time.dtype == np.float64
+    assert sim.nx.dtype.kind == 'i'
+    assert sim.y.nbytes == 40
+    assert sim.y.owner is sim
+
+
+def test_quantity_dtype():
+    "the dtype can be given for each quantity"
+    sim = get_sim()
+    sim.addQuantity('z', [1, 2, 3], dtype=np.float16)
+    sim.w = Quantity(np.ones(3), info='w')
+    sim.addQuantity('v', Quantity([1.0, 2.0], info='v'), copy=False, dtype=np.float64)
+
+    assert sim.z.dtype == np.float16
+    assert sim.w.dtype == np.float32
+    assert sim.w.info == 'w'
+    assert sim.v.dtype == np.float64
+
+    # assigning values keeps the dtype
+
+    sim.y = np.arange(10, dtype=np.float64)
+    assert sim.y.dtype == np.float32
+
+    # quantities converted without copy are owned by the simulation
+
+    sim.addQuantity('u', Quantity(np.ones(3)), copy=False)
+    assert sim.u.dtype == np.float32
+    assert sim.u.owner is sim
+
+
+def test_pinned_dtype_replaced():
+    "a dtype given to addQuantity is kept when the quantity is replaced"
+    sim = Simulation(dtype=np.float32)
+    sim.addQuantity('time', 0.0, dtype=np.float64)
+    sim.addQuantity('dt', 1e-9)
+    sim.diastoler = DataUpdater(['time'])
+
+    sim.time = sim.time + 1e-9
+    sim.time += sim.dt
+    sim.update()
+
+    assert sim.time.dtype == np.float64
+    assert sim.data['time'].dtype == np.float64
+    assert sim.time > 1.5e-9
+
+
+def test_data_dtype():
+    "snapshots keep the dtype of the quantities unless told otherwise"
+    sim = get_sim()
+
+    def timeupdate(time):
+        time += time.owner.dt
+
+    sim.time.updater = timeupdate
+    sim.diastoler = DataUpdater(['time', 'y'])
+    sim.update()
+    sim.update()
+
+    assert sim.data['y'].dtype == np.float32
+    assert sim.data['time'].dtype == np.float64
+    assert sim.time.dtype == np.float64
+
+    sim.diastoler = DataUpdater(['y'], dtype=np.float16)
+    sim.update()
+    assert sim.data['y'].dtype == np.float32
+
+    sim.data.pop('y')
+    sim.update()
+    sim.update()
+    assert sim.data['y'].dtype == np.float16
+    assert sim.data['y'].shape == (2, 10)
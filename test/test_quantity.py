@@ -130,3 +130,25 @@ def test_quantity_repr():
 
     a = Quantity(0, constant=True)
     assert a.__repr__() == 'Constant Quantity(0)'
+
+
+def test_quantity_version():
+    "modifications increase the version"
+    a = Quantity([1., 2., 3.], updater=u)
+    assert a.version == 0
+
+    a.setvalue(2)
+    assert a.version == 1
+
+    a += 1
+    a *= 2
+    assert a.version == 3
+    assert isinstance(a, Quantity)
+    assert np.all(a == 6)
+
+    a.update()
+    assert a.version == 5
+
+    # a new array starts from zero
+
+    assert (a / 2).version == 0
@@ -87,7 +87,7 @@ def test_simulation_repr():
 
     assert sim.__repr__() == string
 
-    assert len(sim.__dir__()) == 53
+    assert len(sim.__dir__()) == 83
 
 
 def test_data_object():
@@ -1,4 +1,9 @@
+import json
+import pickle
+import weakref
+
 import numpy as np
+import pytest
 from simobject import Quantity, Updater, Simulation
 
 
@@ -135,3 +140,107 @@ def test_sim_add_quantity_overwrite_updater():
     u2 = Updater(fct)
     sim.addQuantity('a', a, updater=u2)
     assert a.updater is not sim.a.updater
+
+
+def timeupdate(time):
+    time += 1
+
+
+def test_changed_since():
+    "the simulation knows which quantities changed in which step"
+    sim = Simulation()
+    sim.addQuantity('x', np.arange(3), constant=True)
+    sim.addQuantity('y', np.ones(3))
+    sim.addQuantity('time', 0.0, updater=timeupdate)
+
+    sim.update()
+    assert sim.changed_since(0) == ['x', 'y', 'time']
+    assert sim.changed_since(1) == []
+
+    sim.update()
+    assert sim.changed_since(1) == ['time']
+
+    sim.y = 5
+    assert sim.changed_since(2) == ['y']
+    sim.update()
+    assert sim.changed_since(2) == ['y', 'time']
+    assert sim.changed_since(3) == []
+
+    sim.addQuantity('y', np.ones(3))
+    assert sim.changed_since(3) == ['y']
+
+    # removed quantities are not kept alive by the stamps
+
+    sim.addQuantity('z', np.ones(3))
+    assert sim.changed_since(3) == ['y', 'z']
+    old = weakref.ref(sim.z)
+    del sim._quantities['z']
+    assert old() is None
+
+    # forks and pickles keep the stamps
+
+    sim.update()
+    for other in [sim.fork(), pickle.loads(pickle.dumps(sim))]:
+        assert other.changed_since(3) == ['y', 'time']
+        assert other.changed_since(4) == []
+
+
+def test_add_quantities():
+    "add several quantities at once"
+    sim = Simulation()
+    a = np.arange(3)
+    q = Quantity(np.ones(3), info='q', updater=fct)
+
+    sim.add_quantities({
+        'a': a,
+        'q': q,
+        'c': {'value': 5, 'info': 'constant', 'constant': True},
+        'd': {'value': a, 'copy': False},
+    })
+
+    assert list(sim._quantities.keys()) == ['a', 'q', 'c', 'd']
+    assert sim.a.base is not a
+    assert sim.a.info == 'a'
+    assert sim.q is not q
+    assert sim.q.info == 'q'
+    assert sim.q.updater is q.updater
+    assert sim.c.constant
+    assert sim.c.info == 'constant'
+    assert sim.d.base is a
+
+    for key in ['a', 'q', 'c', 'd']:
+        assert getattr(sim, key).owner is sim
+
+
+def test_add_quantities_checks_first():
+    "a faulty entry raises before anything is added"
+    sim = Simulation()
+
+    with pytest.raises(TypeError):
+        sim.add_quantities({'a': 1, 'b': {'value': 2, 'colour': 'red'}})
+
+    with pytest.raises(ValueError):
+        sim.add_quantities({'a': 1, 'b': {'info': 'no value'}})
+
+    assert len(sim._quantities) == 0
+
+
+def test_from_spec(tmp_path):
+    "create a simulation from a json file"
+    spec = {
+        'quantities': {
+            'x': {'value': [0., 1., 2.], 'info': 'grid', 'constant': True},
+            'y': {'value': [1., 1., 1.], 'updater': 'numpy:negative'},
+        },
+        'update_order': ['y'],
+    }
+    fname = tmp_path / 'spec.json'
+    fname.write_text(json.dumps(spec))
+
+    sim = Simulation.from_spec(fname)
+
+    assert sim.x.constant
+    assert sim.x.info == 'grid'
+    assert np.all(sim.x == [0, 1, 2])
+    assert sim.y.updater.func is np.negative
+    assert sim.update_order == ['y']
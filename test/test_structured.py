@@ -0,0 +1,131 @@
+from simobject import Simulation, DataUpdater, SparseQuantity, BandedQuantity, Quantity
+
+import pickle
+
+import numpy as np
+import pytest
+
+
+def test_banded():
+    "banded storage gives the same products as the full matrix"
+    A = np.diag(np.full(5, 2.0)) + np.diag(np.ones(4), 1) + np.diag(np.full(3, -1.0), -2)
+    x = np.arange(5.0)
+
+    B = BandedQuantity.from_dense(A, 2, 1, info='coupling')
+
+    assert B.shape == (4, 5)
+    assert isinstance(B, Quantity)
+    assert np.all(B.toarray() == A)
+    assert np.allclose(B.dot(x), A @ x)
+
+    C = B * 2
+    assert isinstance(C, BandedQuantity)
+    assert (C.lower, C.upper) == (2, 1)
+    assert np.all(C.toarray() == 2 * A)
+
+    with pytest.raises(ValueError):
+        BandedQuantity(np.ones((2, 5)), 1, 1)
+
+
+def test_banded_in_simulation():
+    "a banded quantity keeps its bands in a simulation, its snapshots are compact"
+    sim = Simulation()
+    sim.addQuantity('A', BandedQuantity(np.ones((3, 10)), 1, 1), info='matrix')
+    sim.diastoler = DataUpdater(['A'])
+    sim.update()
+
+    assert isinstance(sim.A, BandedQuantity)
+    assert sim.A.owner is sim
+    assert sim.A.upper == 1
+    assert sim.data['A'].shape == (1, 3, 10)
+
+    sim2 = pickle.loads(pickle.dumps(sim))
+    assert sim2.A.lower == 1
+
+
+def test_banded_solve():
+    pytest.importorskip('scipy')
+    A = np.diag(np.full(6, 4.0)) + np.diag(np.ones(5), 1) + np.diag(np.ones(5), -1)
+    B = BandedQuantity.from_dense(A, 1, 1)
+    b = np.arange(6.0)
+    assert np.allclose(A @ B.solve(b), b)
+
+
+def grow(q):
+    q.setvalue(q.value * 2)
+
+
+def get_sparse_sim():
+    sparse = pytest.importorskip('scipy.sparse')
+
+    sim = Simulation()
+    source = sparse.random(50, 50, density=0.02, format='csr', random_state=1)
+    sim.addQuantity('source', source, info='source term')
+    sim.addQuantity('mask', sparse.eye(50, format='csr'), constant=True)
+    sim.source.updater = grow
+    sim.diastoler = DataUpdater(['source'])
+    return sim, source
+
+
+def test_sparse_in_simulation():
+    "sparse quantities can be added, updated, and stored"
+    sim, source = get_sparse_sim()
+
+    assert isinstance(sim.source, SparseQuantity)
+    assert sim.source.value is not source
+    assert sim.source.info == 'source term'
+    assert sim.source.owner is sim
+    assert sim.mask.constant
+    assert sim.source.nbytes < source.toarray().nbytes
+
+    sim.update()
+    sim.update()
+
+    assert sim.source.version == 4
+    assert np.allclose(sim.source.toarray(), 4 * source.toarray())
+    assert len(sim.data['source']) == 2
+    assert np.allclose(sim.data['source'][0].toarray(), 2 * source.toarray())
+    assert sim.memory_report()['data']['source'] == 2 * sim.source.nbytes
+
+    with pytest.raises(TypeError):
+        sim.mask.setvalue(0)
+
+    sim.source = 0
+    assert sim.source.nnz == 0
+    assert sim.source.value.format == 'csr'
+
+
+def test_sparse_fork_pickle_rollback():
+    "forks, pickles, and rollbacks work with sparse quantities"
+    sim, source = get_sparse_sim()
+
+    fork = sim.fork()
+    assert fork.mask.value is sim.mask.value
+    assert fork.source.value is not sim.source.value
+    assert fork.source.owner is fork
+
+    sim2 = pickle.loads(pickle.dumps(sim))
+    assert sim2.source.owner is sim2
+    assert np.all(sim2.source.toarray() == source.toarray())
+
+    sim.transactional = True
+    sim.update()
+    sim.rollback()
+    assert np.all(sim.source.toarray() == source.toarray())
+    assert 'source' not in sim.data
+
+    # the stored snapshots are never changed in place
+
+    sim.update()
+    fork = sim.fork()
+    sim.update()
+    assert len(sim.data['source']) == 2
+    assert len(fork.data['source']) == 1
+
+    sim.rollback()
+    assert len(sim.data['source']) == 1
+    assert np.allclose(sim.source.toarray(), 2 * source.toarray())
+
+    part = pickle.loads(pickle.dumps(sim.source))
+    assert part.owner is None
+    assert part.uid != sim.source.uid
@@ -0,0 +1,78 @@
+from simobject import Simulation, Quantity, DataUpdater, Tracer, RingBuffer, JSONLines, ChromeTrace
+
+import json
+
+
+def get_sim():
+    sim = Simulation()
+    sim.addQuantity('time', Quantity(0.0, 'simulation time'))
+    sim.addQuantity('dt', Quantity(0.5, 'time step'))
+    sim.addQuantity('y', Quantity([1.0, 2.0], 'y value'))
+
+    def timeupdate(time):
+        time += time.owner.dt
+
+    def yupdate(y):
+        y *= 2
+
+    sim.time.updater = timeupdate
+    sim.y.updater = yupdate
+    sim.diastoler = DataUpdater(['time'])
+    return sim
+
+
+def test_no_tracer():
+    "without tracer, the steps are still counted"
+    sim = get_sim()
+    assert sim.tracer is None
+    sim.update()
+    sim.update()
+    assert sim.step == 2
+
+
+def test_ring_buffer_events():
+    "each called updater and each step creates an event"
+    sim = get_sim()
+    sim.tracer = Tracer(sinks=[RingBuffer(maxlen=5)])
+
+    sim.update()
+    sim.update()
+
+    events = sim.tracer.events
+    assert len(events) == 5
+
+    step = events[-1]
+    assert step['phase'] == 'step'
+    assert step['step'] == 1
+    assert step['quantity'] is None
+    assert step['dt'] == 0.5
+    assert step['duration'] >= sum(e['duration'] for e in events[-4:-1])
+
+    assert [(e['phase'], e['quantity']) for e in events[-4:-1]] == [
+        ('update', 'time'), ('update', 'y'), ('diastole', None)]
+
+    # the result is the same as without tracing
+
+    assert sim.time == 1.0
+    assert sim.data['time'].shape[0] == 2
+
+
+def test_file_sinks(tmp_path):
+    "JSON lines and chrome traces are valid json"
+    sim = get_sim()
+    sim.tracer = Tracer(sinks=[
+        JSONLines(tmp_path / 'events.jsonl'),
+        ChromeTrace(tmp_path / 'trace.json')])
+
+    for _ in range(3):
+        sim.update()
+    sim.tracer.close()
+
+    lines = (tmp_path / 'events.jsonl').read_text().splitlines()
+    assert len(lines) == 12
+    assert json.loads(lines[-1])['step'] == 2
+
+    trace = json.loads((tmp_path / 'trace.json').read_text())
+    assert len(trace) == 12
+    assert trace[0]['name'] == 'update:time'
+    assert trace[0]['ph'] == 'X'